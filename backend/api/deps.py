@@ -1,23 +1,60 @@
-from fastapi import Depends, HTTPException, status
+import logging
+from collections import Counter
+from uuid import UUID
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
 import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.security import oauth2_scheme
+from api.dto.res.user import UserOutRes
+from api.security import oauth2_scheme, optional_oauth2_scheme
+from core.cache import recent_user_writes, user_cache
 from models.users import RoleEnum
 from core.settings import settings
 from ops.user_ops import get_user_by_id
 from core.db import async_db
+from core.profiling import span
+from core.ratelimit import Limit, rate_limiter, retry_after_header
+
+LOGIN_IP_LIMIT = Limit(
+    "login_ip", settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE, settings.LOGIN_RATE_LIMIT_IP_BURST
+)
+LOGIN_USERNAME_LIMIT = Limit(
+    "login_username", settings.LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE, settings.LOGIN_RATE_LIMIT_USERNAME_BURST
+)
+LOGIN_USERNAME_GLOBAL_LIMIT = Limit(
+    "login_username_global",
+    settings.LOGIN_RATE_LIMIT_USERNAME_GLOBAL_PER_MINUTE,
+    settings.LOGIN_RATE_LIMIT_USERNAME_GLOBAL_BURST,
+)
+AVAILABILITY_IP_LIMIT = Limit(
+    "availability_ip", settings.AVAILABILITY_RATE_LIMIT_PER_MINUTE, settings.AVAILABILITY_RATE_LIMIT_BURST
+)
+# Logins being verified in this worker, per client address
+_logins_in_flight: Counter = Counter()
+_warned_forwarded_for = False
+
+logger = logging.getLogger(__name__)
 
 
 async def get_db():
-    """Dependency that provides a database session for each request"""
+    """Dependency that provides a database session for each request.
+
+    The session only checks out a pooled connection on its first statement;
+    call `release_connection` once the handler is done with the database.
+    """
     async with async_db.get_session() as session:
         yield session
 
 
+async def get_read_db():
+    """Dependency that provides a read-only session, served by a replica when configured"""
+    async with async_db.get_read_session() as session:
+        yield session
+
+
 async def _get_user_from_token(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme)
 ):
     """Helper function to extract user from token"""
     credentials_exception = HTTPException(
@@ -27,11 +64,12 @@ async def _get_user_from_token(
     )
 
     try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY.get_secret_value() if settings.SECRET_KEY else None,
-            algorithms=[settings.ALGORITHM]
-        )
+        with span("jwt"):
+            payload = jwt.decode(
+                token,
+                settings.SECRET_KEY.get_secret_value() if settings.SECRET_KEY else None,
+                algorithms=[settings.ALGORITHM]
+            )
         user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -39,28 +77,53 @@ async def _get_user_from_token(
         if payload.get("type") != "access":
             raise credentials_exception
 
+        user_uuid = UUID(user_id)
+
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.PyJWTError:
+    except (jwt.PyJWTError, ValueError):
         raise credentials_exception
 
-    user = await get_user_by_id(db, user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Only check out a connection on a cache miss. Users written in the last
+    # few seconds are read from the primary so replica lag can't resurrect
+    # the old row into the cache.
+    generation = user_cache.generation
+    if recent_user_writes.get(user_id):
+        session = async_db.get_session()
+    else:
+        session = async_db.get_read_session()
+    async with session as db:
+        user = await get_user_by_id(db, user_uuid)
     if user is None:
         raise credentials_exception
-        
-    return user
+
+    snapshot = UserOutRes.model_validate(user)
+    user_cache.set(user_id, snapshot, generation)
+    return snapshot
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme)
 ):
     """Dependency to get current authenticated user"""
-    return await _get_user_from_token(token, db)
+    return await _get_user_from_token(token)
+
+
+async def get_optional_user(
+    token: str | None = Depends(optional_oauth2_scheme)
+):
+    """Dependency to get the authenticated user, or None for anonymous requests"""
+    if token is None:
+        return None
+    return await _get_user_from_token(token)
 
 
 async def get_current_super_admin(
@@ -119,4 +182,81 @@ def has_role(required_role: RoleEnum):
                 detail=f"Requires at least {required_role.value} privileges",
             )
         return user
-    return role_verifier
\ No newline at end of file
+    return role_verifier
+
+
+def client_ip(request: Request) -> str:
+    """Address of the client, or of the last proxy hop when it is trusted"""
+    global _warned_forwarded_for
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+            return forwarded.rsplit(",", 1)[-1].strip()
+        if not _warned_forwarded_for:
+            _warned_forwarded_for = True
+            logger.warning(
+                "Requests carry X-Forwarded-For but RATE_LIMIT_TRUST_FORWARDED_FOR is off, so rate "
+                "limits are per proxy address and every client behind the proxy shares them"
+            )
+    return request.client.host if request.client else "unknown"
+
+
+async def limit_login_attempts(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
+):
+    """Dependency refusing login attempts over the per-IP or per-username limits.
+
+    Runs before the user lookup and bcrypt, so a credential-stuffing burst
+    is turned away for the cost of a few bucket checks. The strict username
+    bucket is per address, so guesses from elsewhere can't use up the
+    attempts of the account's owner and lock them out. A looser bucket per
+    username alone caps guessing spread over many addresses. An address also gets
+    at most LOGIN_MAX_IN_FLIGHT_PER_IP logins verified at once, so its burst
+    can't take every password hasher worker from everyone else.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        yield
+        return
+    ip = client_ip(request)
+    username = form_data.username.lower()[:100]
+    checks = (
+        (f"login:ip:{ip}", LOGIN_IP_LIMIT),
+        (f"login:username:{username}:{ip}", LOGIN_USERNAME_LIMIT),
+        (f"login:account:{username}", LOGIN_USERNAME_GLOBAL_LIMIT),
+    )
+    if _logins_in_flight[ip] >= settings.LOGIN_MAX_IN_FLIGHT_PER_IP:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": retry_after_header(1)},
+        )
+    for key, limit in checks:
+        retry_after = await rate_limiter.take(key, limit)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, please retry later",
+                headers={"Retry-After": retry_after_header(retry_after)},
+            )
+    _logins_in_flight[ip] += 1
+    try:
+        yield
+    finally:
+        _logins_in_flight[ip] -= 1
+        if not _logins_in_flight[ip]:
+            del _logins_in_flight[ip]
+
+
+async def limit_availability_checks(request: Request):
+    """Dependency refusing availability checks over the per-IP limit, so
+    they can't be used to enumerate registered emails at speed."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    retry_after = await rate_limiter.take(f"availability:ip:{client_ip(request)}", AVAILABILITY_IP_LIMIT)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many availability checks, please retry later",
+            headers={"Retry-After": retry_after_header(retry_after)},
+        )
@@ -0,0 +1,53 @@
+from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+
+from core.storage import MEDIA_ID_PATTERN
+
+
+_TAG_MAX_LENGTH = 50  # The width of the tag columns
+
+
+def _normalize_tags(tags: list[str]) -> list[str]:
+  normalized = []
+  for tag in tags:
+    tag = tag.strip().lower()
+    # Checked after lowercasing, which can make a tag longer
+    if len(tag) > _TAG_MAX_LENGTH:
+      raise ValueError(f"tags can be at most {_TAG_MAX_LENGTH} characters")
+    if tag and tag not in normalized:
+      normalized.append(tag)
+  return normalized
+
+
+class ArticleCreateReq(BaseModel):
+  title: str = Field(min_length=1, max_length=200)
+  body: str
+  summary: Optional[str] = Field(default=None, max_length=500)
+  tags: list[str] = Field(default=[], max_length=10)
+  cover_media_id: Optional[str] = Field(default=None, pattern=MEDIA_ID_PATTERN.pattern)
+  publish: bool = False
+
+  @field_validator("tags")
+  @classmethod
+  def normalize_tags(cls, tags: list[str]) -> list[str]:
+    return _normalize_tags(tags)
+
+class ArticleUpdateReq(BaseModel):
+  title: Optional[str] = Field(default=None, min_length=1, max_length=200)
+  body: Optional[str] = None
+  summary: Optional[str] = Field(default=None, max_length=500)
+  tags: Optional[list[str]] = Field(default=None, max_length=10)
+  cover_media_id: Optional[str] = Field(default=None, pattern=MEDIA_ID_PATTERN.pattern)
+
+  # Optional means "leave unchanged" when omitted, these can't be cleared
+  @field_validator("title", "body")
+  @classmethod
+  def reject_null(cls, value: Optional[str]) -> str:
+    if value is None:
+      raise ValueError("may be omitted but not null")
+    return value
+
+  @field_validator("tags")
+  @classmethod
+  def normalize_tags(cls, tags: Optional[list[str]]) -> Optional[list[str]]:
+    return _normalize_tags(tags) if tags is not None else None
@@ -1,4 +1,5 @@
 from typing import Optional
+from uuid import UUID
 from pydantic import BaseModel
 
 from models.users import RoleEnum
@@ -10,6 +11,9 @@ class UserCreateReq(BaseModel):
   password: str
   full_name: str
 
+class EmailVerificationReq(BaseModel):
+  token: str
+
 class UserCreateAdminReq(UserCreateReq):
   role: RoleEnum = RoleEnum.USER
 
@@ -18,4 +22,9 @@ class UserUpdateReq(BaseModel):
   full_name: Optional[str] = None
 
 class UserUpdateAdminReq(UserUpdateReq):
-  role: RoleEnum = RoleEnum.USER
\ No newline at end of file
+  role: RoleEnum = RoleEnum.USER
+
+class UserBulkUpdateAdminReq(BaseModel):
+  user_ids: list[UUID]
+  role: Optional[RoleEnum] = None
+  is_verified: Optional[bool] = None
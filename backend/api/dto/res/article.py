@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from uuid import UUID
+from datetime import datetime
+
+from models.articles import ArticleStatusEnum
+
+class ArticleSummaryRes(BaseModel):
+    id: UUID
+    slug: str
+    title: str
+    summary: str | None = None
+    author_id: UUID
+    author_username: str | None = None
+    tags: list[str] = []
+    published_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+class ArticleOutRes(ArticleSummaryRes):
+    body: str
+    html: str | None = None
+    cover_media_id: str | None = None
+    status: ArticleStatusEnum
+    views: int = 0
+    claps: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+class ArticleFeedRes(BaseModel):
+    items: list[ArticleSummaryRes]
+    next_cursor: str | None = None
+
+class ArticleSearchHitRes(ArticleSummaryRes):
+    rank: float
+
+class ArticleSearchRes(BaseModel):
+    items: list[ArticleSearchHitRes]
+    next_cursor: str | None = None
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+class MediaOutRes(BaseModel):
+    id: str
+    url: str = ""
+    content_type: str
+    size: int
+    filename: str | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
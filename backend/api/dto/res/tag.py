@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+class TagOutRes(BaseModel):
+    tag: str
+    article_count: int
+
+class TagListRes(BaseModel):
+    items: list[TagOutRes]
+
+class TrendingTagOutRes(TagOutRes):
+    score: float
+
+class TrendingTagListRes(BaseModel):
+    items: list[TrendingTagOutRes]
+    window_hours: int
+    refreshed_at: datetime | None = None
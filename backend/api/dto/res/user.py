@@ -16,4 +16,25 @@ class UserOutRes(BaseModel):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UserAvailabilityRes(BaseModel):
+    # Only set for the names that were asked about
+    username: bool | None = None
+    email: bool | None = None
+
+class UserListRes(BaseModel):
+    items: list[UserOutRes]
+    next_cursor: str | None = None
+
+class UserImportErrorRes(BaseModel):
+    line: int
+    error: str
+
+class UserImportRes(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: list[UserImportErrorRes] = []
+
+class UserBulkUpdateRes(BaseModel):
+    updated: int
@@ -0,0 +1,28 @@
+from uuid import UUID
+
+from api.security import create_email_verification_token
+from core.db import async_db
+from core.jobs import job_queue
+from core.mail import build_message, mailer
+from core.settings import settings
+from ops.user_ops import get_user_by_id
+
+
+@job_queue.task("send_verification_email")
+async def send_verification_email(payload: dict):
+    """Email a verification link to a newly registered user"""
+    async with async_db.get_session() as db:
+        user = await get_user_by_id(db, UUID(payload["user_id"]))
+    # Deleted or already verified since it was queued (or this is a rerun)
+    if user is None or user.is_verified:
+        return
+    token = create_email_verification_token(str(user.id), user.email)
+    link = settings.EMAIL_VERIFICATION_URL.format(token=token)
+    await mailer.send(build_message(
+        user.email,
+        f"Verify your email for {settings.PROJECT_NAME}",
+        f"Hi {user.full_name or user.username},\n\n"
+        f"Please confirm your email address by opening this link:\n\n{link}\n\n"
+        f"It expires in {settings.EMAIL_VERIFICATION_EXPIRE_HOURS} hours. "
+        "If you didn't sign up, you can ignore this email.\n",
+    ))
@@ -0,0 +1,306 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from api.deps import get_current_author, get_current_user, get_db, get_optional_user, get_read_db
+from models.articles import ArticleStatusEnum
+from models.users import RoleEnum
+from ops import article_ops, article_render, media_ops
+from api.dto.req.article import ArticleCreateReq, ArticleUpdateReq
+from api.dto.res.article import ArticleFeedRes, ArticleOutRes, ArticleSearchRes
+from api.dto.res.user import UserOutRes
+from api.conditional import check_not_modified, make_etag
+from api.pagination import decode_cursor, encode_cursor, naive_utc
+from api.serialization import fast_response
+from core.db import release_connection
+from core.markdown import RENDERER_VERSION
+from core.settings import settings
+
+router = APIRouter(tags=["articles"])
+
+def _decode_feed_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        published_at, article_id = decode_cursor(cursor)
+        return naive_utc(datetime.fromisoformat(published_at)), UUID(article_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def _feed_page(db: AsyncSession, rows, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.published_at, last.id)
+    # One query for the whole page's tags rather than one per article
+    tags = await article_ops.get_tags_for_articles(db, [row.id for row in rows])
+    await release_connection(db)
+    items = [{**row._mapping, "tags": tags.get(row.id, [])} for row in rows]
+    return fast_response(ArticleFeedRes, {"items": items, "next_cursor": next_cursor}, trusted=True)
+
+def _can_edit(article, user: Optional[UserOutRes]) -> bool:
+    if user is None:
+        return False
+    return article.author_id == user.id or user.role in [RoleEnum.ADMIN, RoleEnum.SUPER_ADMIN]
+
+async def _article_out(db: AsyncSession, article, author_username: str):
+    tags = await article_ops.get_tags_for_articles(db, [article.id])
+    # Include this worker's unflushed counts so a reader sees their own clap
+    pending = article_ops.pending_counts(article.id)
+    return {
+        **ArticleOutRes.model_validate(article).model_dump(),
+        "author_username": author_username,
+        "tags": tags.get(article.id, []),
+        "html": await article_render.get_body_html(db, article),
+        "views": (article.views or 0) + pending.get("views", 0),
+        "claps": (article.claps or 0) + pending.get("claps", 0),
+    }
+
+def _check_article_not_modified(request: Request, response: Response, article, author_username: str):
+    # Views are left out, or every read would change the tag; claps are
+    # rare enough to include so a reader sees theirs
+    claps = (article.claps or 0) + article_ops.pending_counts(article.id).get("claps", 0)
+    etag = make_etag(article.id, article.updated_at, author_username, claps, RENDERER_VERSION)
+    published = article.status == ArticleStatusEnum.PUBLISHED
+    return check_not_modified(
+        request, response, etag, article.updated_at,
+        cache_control="no-cache" if published else "private, no-cache",
+    )
+
+async def _check_cover(db: AsyncSession, cover_media_id: Optional[str]):
+    if cover_media_id and not await media_ops.get_media(db, cover_media_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown cover media, upload it first"
+        )
+
+async def _get_editable_article(db: AsyncSession, article_id: UUID, user: UserOutRes):
+    row = await article_ops.get_article_by_id(db, article_id)
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    article, author_username = row
+    if not _can_edit(article, user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to modify this article"
+        )
+    return article, author_username
+
+@router.get("", response_model=ArticleFeedRes)
+async def read_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    rows = await article_ops.list_feed(db, limit=limit + 1, after=_decode_feed_cursor(cursor))
+    return await _feed_page(db, rows, limit)
+
+@router.get("/tags/{tag}", response_model=ArticleFeedRes)
+async def read_tag_feed(
+    tag: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    rows = await article_ops.list_tag_feed(
+        db, tag.strip().lower(), limit=limit + 1, after=_decode_feed_cursor(cursor)
+    )
+    return await _feed_page(db, rows, limit)
+
+@router.get("/authors/{author_id}", response_model=ArticleFeedRes)
+async def read_author_feed(
+    author_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    rows = await article_ops.list_feed(
+        db, limit=limit + 1, after=_decode_feed_cursor(cursor), author_id=author_id
+    )
+    return await _feed_page(db, rows, limit)
+
+@router.get("/search", response_model=ArticleSearchRes)
+async def search_articles(
+    q: str = Query(min_length=1, max_length=200),
+    prefix: bool = Query(False, description="Treat the last word as a prefix (search-as-you-type)"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    after = None
+    if cursor:
+        try:
+            rank, article_id = decode_cursor(cursor)
+            after = (float(rank), UUID(article_id))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    hits = await article_ops.search_articles(db, q, limit=limit + 1, after=after, prefix=prefix)
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        rank, last = hits[-1]
+        next_cursor = encode_cursor(rank, last.id)
+    tags = await article_ops.get_tags_for_articles(db, [row.id for _, row in hits])
+    await release_connection(db)
+    items = [{**row._mapping, "rank": rank, "tags": tags.get(row.id, [])} for rank, row in hits]
+    return fast_response(ArticleSearchRes, {"items": items, "next_cursor": next_cursor}, trusted=True)
+
+@router.get("/feed/following", response_model=ArticleFeedRes)
+async def read_following_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    rows = await article_ops.list_following_feed(
+        db, current_user.id, limit=limit + 1, after=_decode_feed_cursor(cursor)
+    )
+    return await _feed_page(db, rows, limit)
+
+@router.post("", response_model=ArticleOutRes, status_code=status.HTTP_201_CREATED)
+async def create_article(
+    article_data: ArticleCreateReq,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_author)
+):
+    await _check_cover(db, article_data.cover_media_id)
+    article = await article_ops.create_article(db, current_user.id, **article_data.model_dump())
+    return {
+        **ArticleOutRes.model_validate(article).model_dump(),
+        "author_username": current_user.username,
+        "tags": article_data.tags,
+        "html": await article_render.get_body_html(db, article),
+    }
+
+@router.get("/by-slug/{slug}", response_model=ArticleOutRes)
+async def read_article_by_slug(
+    slug: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[UserOutRes] = Depends(get_optional_user)
+):
+    row = await article_ops.get_article_by_slug(db, slug)
+    # Drafts are only visible to whoever can edit them
+    if not row or (row[0].status != ArticleStatusEnum.PUBLISHED and not _can_edit(row[0], current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    if row[0].status == ArticleStatusEnum.PUBLISHED:
+        article_ops.record_view(row[0].id)
+    not_modified = _check_article_not_modified(request, response, *row)
+    if not_modified:
+        await release_connection(db)
+        return not_modified
+    article = await _article_out(db, *row)
+    await release_connection(db)
+    return article
+
+@router.get("/{article_id}", response_model=ArticleOutRes)
+async def read_article(
+    article_id: UUID,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[UserOutRes] = Depends(get_optional_user)
+):
+    row = await article_ops.get_article_by_id(db, article_id)
+    if not row or (row[0].status != ArticleStatusEnum.PUBLISHED and not _can_edit(row[0], current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    if row[0].status == ArticleStatusEnum.PUBLISHED:
+        article_ops.record_view(row[0].id)
+    not_modified = _check_article_not_modified(request, response, *row)
+    if not_modified:
+        await release_connection(db)
+        return not_modified
+    article = await _article_out(db, *row)
+    await release_connection(db)
+    return article
+
+@router.patch("/{article_id}", response_model=ArticleOutRes)
+async def update_article(
+    article_id: UUID,
+    article_data: ArticleUpdateReq,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    _, author_username = await _get_editable_article(db, article_id, current_user)
+    update_data = article_data.model_dump(exclude_unset=True)
+    await _check_cover(db, update_data.get("cover_media_id"))
+    article = await article_ops.update_article(db, article_id, **update_data)
+    if article is None:
+        # Deleted since we checked it
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    return await _article_out(db, article, author_username)
+
+@router.post("/{article_id}/publish", response_model=ArticleOutRes)
+async def publish_article(
+    article_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_author)
+):
+    article, author_username = await _get_editable_article(db, article_id, current_user)
+    if article.status != ArticleStatusEnum.PUBLISHED:
+        article = await article_ops.publish_article(db, article_id) or article
+    return await _article_out(db, article, author_username)
+
+@router.post("/{article_id}/clap", status_code=status.HTTP_202_ACCEPTED)
+async def clap_article(
+    article_id: UUID,
+    count: int = Query(1, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    row = await article_ops.get_article_by_id(db, article_id)
+    await release_connection(db)
+    if not row or row[0].status != ArticleStatusEnum.PUBLISHED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    if not article_ops.record_claps(article_id, count):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending claps, try again shortly",
+            headers={"Retry-After": str(int(settings.COUNTER_FLUSH_INTERVAL_SECONDS) or 1)},
+        )
+    return {"message": "Claps recorded"}
+
+@router.post("/{article_id}/unpublish", response_model=ArticleOutRes)
+async def unpublish_article(
+    article_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    article, author_username = await _get_editable_article(db, article_id, current_user)
+    if article.status == ArticleStatusEnum.PUBLISHED:
+        article = await article_ops.unpublish_article(db, article_id) or article
+    return await _article_out(db, article, author_username)
+
+@router.delete("/{article_id}")
+async def delete_article(
+    article_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    await _get_editable_article(db, article_id, current_user)
+    await article_ops.delete_article(db, article_id)
+    return {"message": "Article deleted successfully"}
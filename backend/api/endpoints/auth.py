@@ -1,50 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from api.deps import get_db
+from api.deps import get_db, limit_availability_checks, limit_login_attempts
+from core.db import release_connection
 from ops.user_ops import (
-    get_user_by_email,
+    UserAlreadyExistsError,
+    get_user_by_id,
     get_user_by_username,
-    create_user
+    create_user,
+    update_user
 )
-from api.dto.req.user import UserCreateReq
-from api.dto.res.user import UserOutRes
+from api.dto.req.user import EmailVerificationReq, UserCreateReq
+from api.dto.res.user import UserAvailabilityRes, UserOutRes
+from ops.user_availability import user_availability
 
-from api.security import create_access_token, get_password_hash, verify_password
+from api.security import (
+    create_access_token,
+    decode_email_verification_token,
+    get_password_hash_async,
+    verify_password_async
+)
 
 router = APIRouter(tags=["auth"])
 
 @router.post("/register", response_model=UserOutRes)
 async def register(user_data: UserCreateReq, db: AsyncSession = Depends(get_db)):
-    if await get_user_by_email(db, user_data.email):
+    password = await get_password_hash_async(user_data.password)
+
+    # Uniqueness is enforced by the insert itself, so concurrent signups
+    # for the same email or username can't both succeed
+    try:
+        user = await create_user(
+            db,
+            username=user_data.username,
+            email=user_data.email,
+            password=password,
+            full_name=user_data.full_name,
+            # Sent by the job queue, so SMTP latency and outages stay out of signup
+            send_verification_email=True
+        )
+    except UserAlreadyExistsError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+            detail=exc.detail
         )
-    if await get_user_by_username(db, user_data.username):
+    return user
+
+@router.post("/verify-email", response_model=UserOutRes)
+async def verify_email(data: EmailVerificationReq, db: AsyncSession = Depends(get_db)):
+    claims = decode_email_verification_token(data.token)
+    user = await get_user_by_id(db, UUID(claims[0])) if claims else None
+    # The token is for the address the user has now
+    if user is None or user.email != claims[1]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
+            detail="Invalid or expired verification link"
         )
-    
-    password = get_password_hash(user_data.password)
-    
-    user = await create_user(
-        db,
-        username=user_data.username,
-        email=user_data.email,
-        password=password,
-        full_name=user_data.full_name
-    )
-    return user
+    if user.is_verified:
+        return user
+    return await update_user(db, user.id, is_verified=True)
+
+@router.get("/availability", response_model=UserAvailabilityRes, dependencies=[Depends(limit_availability_checks)])
+async def check_availability(
+    username: Optional[str] = Query(None, min_length=1, max_length=50),
+    email: Optional[str] = Query(None, min_length=1, max_length=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Whether a username and / or email is still free, for signup forms.
+
+    A hint only: registration still enforces uniqueness.
+    """
+    if username is None and email is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass a username, an email or both"
+        )
+    availability = UserAvailabilityRes()
+    if username is not None:
+        availability.username = await user_availability.is_available(db, "username", username)
+    if email is not None:
+        availability.email = await user_availability.is_available(db, "email", email)
+    return availability
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(limit_login_attempts)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
     user = await get_user_by_username(db, form_data.username)
-    if not user or not verify_password(form_data.password, str(user.password)):
+    # Don't hold a pooled connection through bcrypt
+    await release_connection(db)
+    hashed_password = str(user.password) if user else None
+    if not await verify_password_async(form_data.password, hashed_password) or not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.conditional import check_not_modified
+from api.deps import get_current_author, get_db
+from api.dto.res.media import MediaOutRes
+from api.dto.res.user import UserOutRes
+from core.settings import settings
+from core.storage import MEDIA_ID_PATTERN, MediaTooLargeError, UnsupportedMediaError, media_storage
+from ops import media_ops
+
+router = APIRouter(tags=["media"])
+
+def media_url(media_id: str) -> str:
+    return f"{settings.API_PREFIX}/media/{media_id}"
+
+def _media_out(media):
+    return {**MediaOutRes.model_validate(media, from_attributes=True).model_dump(), "url": media_url(media.id)}
+
+@router.post("", response_model=MediaOutRes, status_code=status.HTTP_201_CREATED)
+async def upload_media(
+    request: Request,
+    filename: Optional[str] = Query(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_author)
+):
+    """Upload an image or video as the raw request body.
+
+    The body is streamed to disk and hashed on the way, never held in
+    memory whole. Identical content is stored once and returns the same id.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MEDIA_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Media larger than {settings.MEDIA_MAX_BYTES} bytes"
+        )
+    try:
+        stored = await media_storage.save(request.stream())
+    except MediaTooLargeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=exc.detail
+        )
+    except UnsupportedMediaError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=exc.detail
+        )
+    # The session only checks out a connection now, after the upload
+    media = await media_ops.create_media(db, stored, filename, current_user.id)
+    return _media_out(media)
+
+@router.get("/{media_id}")
+async def read_media(media_id: str, request: Request, response: Response):
+    """Serve a stored file. Its id is its content hash, so it is cached for good"""
+    path = media_storage.path_for(media_id) if MEDIA_ID_PATTERN.match(media_id) else None
+    if path is None or not await asyncio.to_thread(path.is_file):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Media not found"
+        )
+    # Strong validator: the name is the sha256 of the bytes
+    not_modified = check_not_modified(
+        request, response, f'"{media_id.split(".")[0]}"',
+        cache_control=f"public, max-age={settings.MEDIA_CACHE_MAX_AGE_SECONDS}, immutable",
+    )
+    if not_modified:
+        return not_modified
+    return media_storage.response(media_id, {
+        "ETag": response.headers["etag"],
+        "Cache-Control": response.headers["cache-control"],
+        "X-Content-Type-Options": "nosniff",
+    })
@@ -0,0 +1,49 @@
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from api.deps import get_current_super_admin
+from api.dto.res.user import UserOutRes
+from core.profiling import PROFILE_ID_PATTERN, profile_path, profile_window, window_running
+from core.settings import settings
+
+router = APIRouter(tags=["profiling"])
+
+@router.post("/window", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=settings.PROFILING_MAX_WINDOW_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    current_user: UserOutRes = Depends(get_current_super_admin)
+):
+    """Sample every thread of the worker serving this request for `seconds`.
+
+    Returns collapsed stacks for flamegraph.pl / speedscope, and the spans
+    timed meanwhile (JWT, user queries, bcrypt, serialization) summed up
+    in the Server-Timing header. Each call profiles a single worker.
+    """
+    if window_running():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This worker is already being profiled"
+        )
+    collapsed, spans = await profile_window(seconds, interval_ms / 1000)
+    filename = f"profile-{os.getpid()}-{int(time.time())}.folded"
+    return PlainTextResponse(collapsed, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Server-Timing": spans.server_timing(),
+        "X-Profile-Worker": str(os.getpid()),
+    })
+
+@router.get("/requests/{profile_id}", response_class=FileResponse)
+async def read_request_profile(
+    profile_id: str,
+    current_user: UserOutRes = Depends(get_current_super_admin)
+):
+    """Collapsed stacks of a request sent with the X-Profile header"""
+    # Checked first, so the id can't point outside PROFILING_DIR
+    if not PROFILE_ID_PATTERN.match(profile_id) or not profile_path(profile_id).is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return FileResponse(profile_path(profile_id), media_type="text/plain", filename=f"{profile_id}.folded")
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from api.dto.res.tag import TagListRes, TagOutRes, TrendingTagListRes
+from api.serialization import fast_response
+from core.settings import settings
+from ops.tag_ops import tag_stats
+
+router = APIRouter(tags=["tags"])
+
+# Answered from memory, refreshed every TAGS_REFRESH_SECONDS by ops.tag_ops.tag_stats
+
+@router.get("", response_model=TagListRes)
+async def read_tags(limit: int = Query(50, ge=1, le=settings.TAGS_CACHE_SIZE)):
+    """Most used tags, by published articles"""
+    return fast_response(TagListRes, {"items": tag_stats.top[:limit]}, trusted=True)
+
+@router.get("/trending", response_model=TrendingTagListRes)
+async def read_trending_tags(limit: int = Query(20, ge=1, le=settings.TAGS_TRENDING_SIZE)):
+    """Tags with the most recent publishes, newer ones weighing more"""
+    return fast_response(TrendingTagListRes, {
+        "items": tag_stats.trending[:limit],
+        "window_hours": settings.TAGS_TRENDING_WINDOW_HOURS,
+        "refreshed_at": tag_stats.refreshed_at,
+    }, trusted=True)
+
+@router.get("/{tag}", response_model=TagOutRes)
+async def read_tag(tag: str):
+    tag = tag.strip().lower()
+    count = await tag_stats.get_count(tag)
+    if count <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tag not found"
+        )
+    return {"tag": tag, "article_count": count}
@@ -1,33 +1,139 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from api.deps import get_current_admin, get_current_super_admin, get_db
+from api.deps import get_current_admin, get_current_super_admin, get_db, get_read_db
 from models import UserModel
-from ops import user_ops
-from api.dto.req.user import UserUpdateReq
-from api.dto.res.user import UserOutRes
+from models.users import RoleEnum
+from ops import timeline_ops, user_ops
+from api.dto.req.user import UserBulkUpdateAdminReq, UserUpdateReq
+from api.dto.res.user import UserBulkUpdateRes, UserImportRes, UserListRes, UserOutRes
+from api.conditional import check_not_modified, make_etag
 from api.deps import get_current_user
+from api.pagination import decode_cursor, encode_cursor, naive_utc
+from api.serialization import fast_response
+from api.user_io import EXPORT_FORMATS, IMPORT_MAX_BATCH_SIZE, export_users, import_users
+from core.cache import user_cache
+from core.db import release_connection
+from core.settings import settings
 
 router = APIRouter(tags=["users"])
 
+def _user_validators(user):
+    last_modified = user.updated_at or user.created_at
+    return make_etag(user.id, last_modified), last_modified
+
+@router.get("", response_model=UserListRes)
+async def list_users(
+    role: Optional[RoleEnum] = None,
+    is_verified: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserOutRes = Depends(get_current_admin)
+):
+    after = None
+    if cursor:
+        try:
+            created_at, user_id = decode_cursor(cursor)
+            after = (naive_utc(datetime.fromisoformat(created_at)), UUID(user_id))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    users = await user_ops.list_users(
+        db,
+        limit=limit + 1,
+        after=after,
+        role=role,
+        is_verified=is_verified,
+        created_from=naive_utc(created_from),
+        created_to=naive_utc(created_to),
+    )
+    await release_connection(db)
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return fast_response(UserListRes, {"items": users, "next_cursor": next_cursor}, trusted=True)
+
+@router.get("/export")
+async def export_all_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    current_user: UserOutRes = Depends(get_current_admin)
+):
+    return StreamingResponse(
+        export_users(format, batch_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+@router.post("/import", response_model=UserImportRes)
+async def import_all_users(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(1000, ge=1, le=IMPORT_MAX_BATCH_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_admin)
+):
+    # Hashed on its own small pool, so a big import can't take the login pool's workers
+    workers = settings.USER_IMPORT_HASH_WORKERS
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt-import") as executor:
+        return await import_users(db, request.stream(), format, batch_size, executor=executor, workers=workers)
+
+@router.patch("/bulk", response_model=UserBulkUpdateRes)
+async def bulk_update_users(
+    user_data: UserBulkUpdateAdminReq,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_admin)
+):
+    update_data = user_data.model_dump(exclude={"user_ids"}, exclude_none=True)
+    if not update_data or not user_data.user_ids:
+        return {"updated": 0}
+    updated = await user_ops.bulk_update_users(db, user_data.user_ids, **update_data)
+    return {"updated": len(updated)}
+
 @router.get("/me", response_model=UserOutRes)
 async def read_current_user(
+    request: Request,
+    response: Response,
     current_user: UserOutRes = Depends(get_current_user)
 ):
+    # Usually served from the auth cache snapshot, so a 304 costs no query
+    not_modified = check_not_modified(request, response, *_user_validators(current_user))
+    if not_modified:
+        return not_modified
     return current_user
 
 @router.get("/{user_id}", response_model=UserOutRes)
 async def read_user(
     user_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserOutRes = Depends(get_current_admin)
 ):
-    user = await user_ops.get_user_by_id(db, user_id)
+    # The session only checks out a connection when the cache misses
+    user = user_cache.get(str(user_id))
+    if user is None:
+        user = await user_ops.get_user_by_id(db, user_id)
+        await release_connection(db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    not_modified = check_not_modified(request, response, *_user_validators(user))
+    if not_modified:
+        return not_modified
     return user
 
 @router.patch("/me", response_model=UserOutRes)
@@ -37,8 +143,13 @@ async def update_current_user(
     current_user: UserOutRes = Depends(get_current_user)
 ):
     update_data = user_data.model_dump(exclude_unset=True)
-    print(update_data)
-    return await user_ops.update_user(db, current_user.id, **update_data)
+    try:
+        return await user_ops.update_user(db, current_user.id, **update_data)
+    except user_ops.UserAlreadyExistsError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=exc.detail
+        )
 
 @router.delete("/{user_id}")
 async def delete_user(
@@ -46,11 +157,42 @@ async def delete_user(
     db: AsyncSession = Depends(get_db),
     current_user: UserOutRes = Depends(get_current_super_admin)
 ):
-    user = await user_ops.get_user_by_id(db, user_id)
+    user = await user_ops.delete_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    await user_ops.delete_user(db, UUID(str(user.id)))
-    return {"message": "User deleted successfully"}
\ No newline at end of file
+    return {"message": "User deleted successfully"}
+
+@router.post("/{user_id}/follow")
+async def follow_user(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You cannot follow yourself"
+        )
+    if not await user_ops.get_user_by_id(db, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    await timeline_ops.follow_user(db, current_user.id, user_id)
+    return {"message": "User followed successfully"}
+
+@router.delete("/{user_id}/follow")
+async def unfollow_user(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOutRes = Depends(get_current_user)
+):
+    if not await timeline_ops.unfollow_user(db, current_user.id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not following this user"
+        )
+    return {"message": "User unfollowed successfully"}
@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    """Decode a cursor produced by `encode_cursor` back into its string values.
+
+    Raises ValueError for anything else, callers answer that with a 400.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    # binascii.Error, UnicodeDecodeError and JSONDecodeError are all ValueErrors
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC, so aware bounds are converted to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
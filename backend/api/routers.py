@@ -3,9 +3,19 @@ from fastapi import APIRouter
 # Import all your routers here
 from api.endpoints.users import router as users_router
 from api.endpoints.auth import router as auth_router
+from api.endpoints.articles import router as articles_router
+from api.endpoints.media import router as media_router
+from api.endpoints.tags import router as tags_router
+from api.endpoints.profiling import router as profiling_router
+from core.settings import settings
 
 api_router = APIRouter()
 
 # Include all your routers
 api_router.include_router(users_router, prefix="/users")
 api_router.include_router(auth_router, prefix="/auth")
+api_router.include_router(articles_router, prefix="/articles")
+api_router.include_router(media_router, prefix="/media")
+api_router.include_router(tags_router, prefix="/tags")
+if settings.PROFILING_ENABLED:
+    api_router.include_router(profiling_router, prefix="/admin/profiling")
@@ -1,9 +1,16 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+import secrets
+from typing import Callable, Optional
 import jwt
 from pwdlib import PasswordHash
 from pwdlib.hashers.bcrypt import BcryptHasher
 
+from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from core.metrics import metrics
+from core.profiling import span
 from core.settings import settings
 
 # Password hashing context
@@ -17,8 +24,134 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(password, hashed_password)
 
+def _hash_chunk(passwords: list[str]) -> list[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+class PasswordHasherPool:
+    """Runs bcrypt off the event loop on a bounded thread or process pool"""
+
+    def __init__(self, workers: int, max_queue: int, use_processes: bool = False):
+        self._workers = workers
+        self._max_pending = workers + max_queue
+        self._use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._dummy_hash: Optional[str] = None
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args):
+        if self._pending >= self._max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with span("bcrypt"):
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def start(self):
+        """Spin up the pool and precompute the dummy hash (call this at startup)"""
+        if self._dummy_hash is None:
+            self._dummy_hash = await self._run(get_password_hash, secrets.token_urlsafe(32))
+
+    async def hash(self, password: str) -> str:
+        """Hash a password on the pool"""
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(
+        self,
+        passwords: list[str],
+        executor: Optional[Executor] = None,
+        workers: Optional[int] = None,
+    ) -> list[str]:
+        """Hash a batch of passwords in parallel, one chunk per worker.
+
+        Offline jobs can pass their own `executor` (and its worker count) so
+        they don't compete with logins for the shared pool.
+        """
+        if not passwords:
+            return []
+        workers = workers or self._workers
+        size = -(-len(passwords) // workers)
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        if executor is None:
+            results = await asyncio.gather(*(self._run(_hash_chunk, chunk) for chunk in chunks))
+        else:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(loop.run_in_executor(executor, _hash_chunk, chunk) for chunk in chunks)
+            )
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        """Verify a password on the pool.
+
+        A missing hash (unknown user) is checked against a dummy hash so the
+        response takes as long as it would for an existing account.
+        """
+        if hashed_password is None:
+            await self.start()
+            await self._run(verify_password, password, self._dummy_hash)
+            return False
+        return await self._run(verify_password, password, hashed_password)
+
+    def shutdown(self):
+        """Stop the worker pool (call this at shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasherPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_EXECUTOR == "process",
+)
+
+metrics.callback(
+    "password_hash_pending", "Hashes running or queued on the pool", "gauge",
+    lambda: password_hasher.pending,
+)
+metrics.callback(
+    "password_hash_rejected_total", "Hashes rejected with 503 because the queue was full", "counter",
+    lambda: password_hasher.rejected,
+)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash without blocking the event loop"""
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(password: str, hashed_password: Optional[str]) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await password_hasher.verify(password, hashed_password)
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Same scheme, but anonymous requests get a None token instead of a 401
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 
 def create_access_token(user_id: str) -> str:
@@ -39,3 +172,38 @@ def create_access_token(user_id: str) -> str:
         algorithm=settings.ALGORITHM
     )
 
+
+def create_email_verification_token(user_id: str, email: str) -> str:
+    """Create the JWT sent in verification emails.
+
+    It carries the address it was sent to, so it stops working once the
+    user changes their email.
+    """
+    now = datetime.utcnow()
+    payload = {
+        "sub": str(user_id),
+        "email": email,
+        "exp": now + timedelta(hours=settings.EMAIL_VERIFICATION_EXPIRE_HOURS),
+        "iat": now,
+        "type": "verify_email"
+    }
+    return jwt.encode(
+        payload,
+        settings.SECRET_KEY.get_secret_value() if settings.SECRET_KEY else None,
+        algorithm=settings.ALGORITHM
+    )
+
+
+def decode_email_verification_token(token: str) -> Optional[tuple[str, str]]:
+    """(user id, email) from a valid verification token, None otherwise"""
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY.get_secret_value() if settings.SECRET_KEY else None,
+            algorithms=[settings.ALGORITHM]
+        )
+    except jwt.PyJWTError:
+        return None
+    if payload.get("type") != "verify_email" or "sub" not in payload or "email" not in payload:
+        return None
+    return payload["sub"], payload["email"]
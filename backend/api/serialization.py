@@ -0,0 +1,138 @@
+import enum
+import json
+import types
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Optional, Union, get_args, get_origin
+from uuid import UUID
+
+import fastapi.routing
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from core.profiling import span
+from core.settings import settings
+
+try:
+    import orjson
+except ImportError:  # Optional, the stdlib encoder is used without it
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """Encode plain data (dicts, lists, UUIDs, datetimes, enums) as compact JSON"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for bodies that are already encoded, or plain data to encode with `dumps`"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+@lru_cache(maxsize=None)
+def get_adapter(response_type: Any) -> TypeAdapter:
+    """TypeAdapter for a response DTO, built once per type"""
+    return TypeAdapter(response_type)
+
+
+def _nested_model(annotation: Any) -> Optional[tuple[bool, type[BaseModel]]]:
+    """(is_list, model) when a field holds DTOs (or a list of them)"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return False, annotation
+    origin = get_origin(annotation)
+    if origin is list:
+        nested = _nested_model(get_args(annotation)[0])
+        return (True, nested[1]) if nested and not nested[0] else None
+    if origin in (Union, types.UnionType):
+        for arg in get_args(annotation):
+            if arg is not type(None) and (nested := _nested_model(arg)):
+                return nested
+    return None
+
+
+@lru_cache(maxsize=None)
+def _field_plan(model: type[BaseModel]) -> tuple:
+    return tuple(
+        (name, field.get_default(call_default_factory=True), _nested_model(field.annotation))
+        for name, field in model.model_fields.items()
+    )
+
+
+def _to_plain(model: type[BaseModel], obj: Any) -> Optional[dict]:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        values, obj = obj, None
+    else:
+        # Loaded ORM columns sit in the instance __dict__; anything else
+        # (properties, unloaded attributes) goes through getattr
+        values = getattr(obj, "__dict__", {})
+    plain = {}
+    for name, default, nested in _field_plan(model):
+        if name in values:
+            value = values[name]
+        else:
+            value = default if obj is None else getattr(obj, name, default)
+        if nested is not None and value is not None:
+            is_list, nested_model = nested
+            value = [_to_plain(nested_model, item) for item in value] if is_list else _to_plain(nested_model, value)
+        plain[name] = value
+    return plain
+
+
+def encode(model: type[BaseModel], data: Any, trusted: bool = False) -> bytes:
+    """Serialize `data` (ORM objects, rows or dicts) as `model` JSON.
+
+    By default it is validated through the model's TypeAdapter and dumped
+    straight to bytes by pydantic-core. `trusted` data, like rows just read
+    from our own database, skips validation: only the model's fields are
+    copied out and encoded, so it must already have the right types.
+    """
+    with span("serialize"):
+        if trusted:
+            return dumps(_to_plain(model, data))
+        adapter = get_adapter(model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def trace_response_model_serialization():
+    """Time FastAPI's own response_model pass (validate, then jsonable_encoder)
+    as a "serialize" span too. It has no hook, so this wraps the function its
+    request handlers look up on every response (call once, at startup)."""
+    serialize_response = fastapi.routing.serialize_response
+    if getattr(serialize_response, "__wrapped__", None) is not None:
+        return
+
+    async def traced_serialize_response(*args, **kwargs):
+        with span("serialize"):
+            return await serialize_response(*args, **kwargs)
+
+    traced_serialize_response.__wrapped__ = serialize_response
+    fastapi.routing.serialize_response = traced_serialize_response
+
+
+def fast_response(model: type[BaseModel], data: Any, trusted: bool = False) -> Any:
+    """Encoded response for `data`, or `data` itself for FastAPI's regular
+    `response_model` path when FAST_SERIALIZATION is off.
+
+    Keep `response_model=model` on the route so the OpenAPI schema and the
+    fallback path stay the same.
+    """
+    if not settings.FAST_SERIALIZATION:
+        return data
+    return FastJSONResponse(encode(model, data, trusted))
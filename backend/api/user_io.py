@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+import logging
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.dto.req.user import UserCreateReq
+from api.dto.res.user import UserImportErrorRes, UserImportRes, UserOutRes
+from api.security import password_hasher
+from api.serialization import encode
+from core.db import async_db
+from core.settings import settings
+from models import UserModel
+from ops import user_ops
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+# Rows per INSERT, keeps a batch under asyncpg's 32767 bind parameters
+IMPORT_MAX_BATCH_SIZE = 4000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Only the columns exposed through UserOutRes, never the password hash
+_EXPORT_COLUMNS = [getattr(UserModel, name) for name in UserOutRes.model_fields]
+
+
+class ExportStats:
+    def __init__(self):
+        self.rows = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _encode_ndjson(rows) -> bytes:
+    if settings.FAST_SERIALIZATION:
+        # Rows come straight from the users table, no need to re-validate them
+        return b"".join(encode(UserOutRes, row, trusted=True) + b"\n" for row in rows)
+    return b"".join(
+        UserOutRes.model_validate(row).model_dump_json().encode() + b"\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(UserOutRes.model_validate(row).model_dump(mode="json").values())
+    return buffer.getvalue().encode()
+
+
+async def export_users(fmt: str, batch_size: int, stats: ExportStats | None = None) -> AsyncIterator[bytes]:
+    """Stream every user as NDJSON or CSV, one chunk per batch.
+
+    Opens its own session: a StreamingResponse body outlives the request's
+    dependencies, so the `get_db` session is already closed by then.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    stats = stats or ExportStats()
+    encode = _encode_ndjson if fmt == "ndjson" else _encode_csv
+    if fmt == "csv":
+        yield (",".join(UserOutRes.model_fields) + "\r\n").encode()
+
+    async with async_db.get_read_session() as session:
+        async for rows in user_ops.stream_users(session, _EXPORT_COLUMNS, batch_size):
+            stats.rows += len(rows)
+            yield encode(rows)
+
+    stats.finished_at = time.perf_counter()
+    logger.info(
+        "Exported %d users in %.2fs (%.0f rows/s)",
+        stats.rows, stats.elapsed, stats.rows_per_second,
+    )
+
+
+async def _iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+
+async def _iter_records(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line number, record, error) for every non-empty input line"""
+    header = None
+    line_no = 0
+    async for raw_line in _iter_lines(chunks):
+        line_no += 1
+        if not raw_line.strip():
+            continue
+        try:
+            # Per line, so one badly encoded record doesn't fail the import
+            line = raw_line.decode()
+            if fmt == "ndjson":
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            else:
+                # One record per line: quoted fields can't span lines
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = values
+                    continue
+                record = dict(zip(header, values))
+        except ValueError as exc:
+            yield line_no, None, f"Malformed {fmt} record: {exc}"
+            continue
+        yield line_no, record, None
+
+
+async def import_users(
+    db: AsyncSession,
+    chunks: AsyncIterable[bytes],
+    fmt: str,
+    batch_size: int = 1000,
+    executor: Optional[Executor] = None,
+    workers: Optional[int] = None,
+) -> UserImportRes:
+    """Bulk-create users from NDJSON or CSV `UserCreateReq` records.
+
+    Passwords for each batch are hashed in parallel, then the batch goes in
+    as one multi-row INSERT ... ON CONFLICT DO NOTHING. Invalid and
+    conflicting rows are reported by line number instead of failing the
+    whole import.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    report = UserImportRes()
+    started_at = time.perf_counter()
+
+    def fail(line_no: int, error: str):
+        report.failed += 1
+        report.errors.append(UserImportErrorRes(line=line_no, error=error))
+
+    async def flush(batch: list[tuple[int, UserCreateReq]]):
+        hashes = await password_hasher.hash_many(
+            [record.password for _, record in batch], executor=executor, workers=workers
+        )
+        rows = [
+            {**record.model_dump(), "password": hashed}
+            for (_, record), hashed in zip(batch, hashes)
+        ]
+        inserted, conflicts = await user_ops.bulk_insert_users(db, rows)
+        report.inserted += len(inserted)
+        for (line_no, _), row in zip(batch, rows):
+            if row["id"] in conflicts:
+                fail(line_no, conflicts[row["id"]])
+
+    batch: list[tuple[int, UserCreateReq]] = []
+    async for line_no, record, error in _iter_records(chunks, fmt):
+        if error is not None:
+            fail(line_no, error)
+            continue
+        try:
+            batch.append((line_no, UserCreateReq.model_validate(record)))
+        except ValidationError as exc:
+            fail(line_no, "; ".join(
+                f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()
+            ))
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    report.errors.sort(key=lambda error: error.line)
+
+    elapsed = time.perf_counter() - started_at
+    logger.info(
+        "Imported %d users (%d failed) in %.2fs (%.0f rows/s)",
+        report.inserted, report.failed, elapsed,
+        (report.inserted + report.failed) / elapsed if elapsed else 0.0,
+    )
+    return report
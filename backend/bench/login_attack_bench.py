@@ -0,0 +1,206 @@
+"""Legitimate-traffic latency during a simulated credential-stuffing attack.
+
+Starts the app under uvicorn once per phase and, for `--duration` seconds,
+keeps probing it with legitimate traffic (GET /users/me and correct logins
+from their own address) while attackers flood POST /auth/login with wrong
+passwords from a handful of addresses:
+
+    python -m bench.login_attack_bench --db sqlite --duration 30
+
+Phases: `baseline` (no attack), `attack_unprotected` (RATE_LIMIT_ENABLED
+off) and `attack_protected`. Attacker addresses are sent as
+X-Forwarded-For, which the app is told to trust for the run.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from bench.run import (
+    BACKEND_DIR, PASSWORD, _cleanup_environment, _configure_environment, _create_schema, _free_port, _git_commit,
+    _percentile, _seed, _wait_until_up,
+)
+
+PHASES = ("baseline", "attack_unprotected", "attack_protected")
+
+
+def _summary(latencies: list[float], statuses: Counter) -> dict:
+    latencies.sort()
+    return {
+        "requests": sum(statuses.values()),
+        "statuses": dict(statuses),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def _probe(make_request, deadline: float, interval: float) -> dict:
+    """Send one legitimate request every `interval` seconds until `deadline`"""
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = (await make_request()).status_code
+        except httpx.HTTPError:
+            status = "error"
+        statuses[status] += 1
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(max(interval - (time.perf_counter() - started), 0))
+    return _summary(latencies, statuses)
+
+
+async def _attack(base_url: str, prefix: str, duration: float, args) -> dict:
+    statuses: Counter = Counter()
+    addresses = [f"203.0.113.{i + 1}" for i in range(args.attack_addresses)]
+    usernames = [f"victim_{i}" for i in range(args.attack_usernames)]
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=args.attack_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=httpx.Timeout(args.timeout)) as client:
+
+        async def attacker():
+            while time.monotonic() < deadline:
+                try:
+                    response = await client.post(
+                        f"{prefix}/auth/login",
+                        data={"username": random.choice(usernames), "password": "wrong-password"},
+                        headers={"X-Forwarded-For": random.choice(addresses)},
+                    )
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError:
+                    statuses["error"] += 1
+
+        await asyncio.gather(*(attacker() for _ in range(args.attack_concurrency)))
+    return {"requests": sum(statuses.values()), "statuses": dict(statuses)}
+
+
+def _attack_process(base_url: str, prefix: str, duration: float, args) -> dict:
+    """Attackers get their own process (and event loop) so they don't delay the probes client-side"""
+    return asyncio.run(_attack(base_url, prefix, duration, args))
+
+
+async def _run_phase(phase: str, args, seed) -> dict:
+    from core.settings import settings
+
+    _, tokens, _, usernames = seed
+    env = os.environ.copy()
+    env["RATE_LIMIT_TRUST_FORWARDED_FOR"] = "true"
+    env["RATE_LIMIT_ENABLED"] = "false" if phase == "attack_unprotected" else "true"
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    prefix = settings.API_PREFIX
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(args.timeout)) as client:
+            await _wait_until_up(client)
+            deadline = time.monotonic() + args.duration
+            legit = {"Authorization": f"Bearer {tokens[0]}"}
+            logins = itertools.cycle(usernames)
+            probes = {
+                "me": _probe(lambda: client.get(f"{prefix}/users/me", headers=legit), deadline, 0.05),
+                # Legitimate users take turns logging in from their own address
+                "login": _probe(
+                    lambda: client.post(
+                        f"{prefix}/auth/login",
+                        data={"username": next(logins), "password": PASSWORD},
+                        headers={"X-Forwarded-For": "198.51.100.7"},
+                    ),
+                    deadline, args.login_interval,
+                ),
+            }
+            tasks = [*probes.values()]
+            if phase != "baseline":
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    tasks.append(loop.run_in_executor(pool, _attack_process, base_url, prefix, args.duration, args))
+                    outcomes = await asyncio.gather(*tasks)
+            else:
+                outcomes = await asyncio.gather(*tasks)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    result = dict(zip([*probes, "attack"], outcomes))
+    for name, summary in result.items():
+        print(f"{phase:>18} {name:>6}: {summary}", file=sys.stderr)
+    return result
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from core.db import async_db
+
+    if args.create_schema:
+        await _create_schema()
+    else:
+        await async_db.init()
+    try:
+        seed = await _seed(args.users)
+    finally:
+        await async_db.close()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "workers": args.workers,
+            "database": args.db.split("://", 1)[0],
+            "users": args.users,
+            "duration": args.duration,
+            "attack_concurrency": args.attack_concurrency,
+            "attack_addresses": args.attack_addresses,
+            "attack_usernames": args.attack_usernames,
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "phases": {phase: await _run_phase(phase, args, seed) for phase in args.phases},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite", help="'sqlite' or a SQLAlchemy async URL")
+    parser.add_argument("--create-schema", action="store_true", help="Create the tables first (implied for sqlite)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10, help="Legitimate users taking turns to log in")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per phase")
+    parser.add_argument("--attack-concurrency", type=int, default=64)
+    parser.add_argument("--attack-addresses", type=int, default=2)
+    parser.add_argument("--attack-usernames", type=int, default=200)
+    parser.add_argument("--login-interval", type=float, default=2, help="Seconds between legitimate logins")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        _cleanup_environment(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
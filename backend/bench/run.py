@@ -0,0 +1,358 @@
+"""Load benchmarks for the auth and user endpoints.
+
+Drives the FastAPI app either in-process (httpx ASGI transport) or through
+real uvicorn workers, against Postgres or a SQLite stand-in, and writes the
+results as JSON so runs can be compared between commits:
+
+    pip install -r bench/requirements.txt
+    python -m bench.run run --db sqlite --concurrency 16 --requests 400 --output head.json
+    python -m bench.run run --target uvicorn --workers 2 --db postgresql+asyncpg://u:p@localhost/bench
+    python -m bench.run compare base.json head.json --threshold 0.10
+
+`compare` exits with status 1 when a scenario's throughput drops or its p95
+latency grows by more than the threshold.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCENARIOS = ("register", "login", "me", "user_by_id", "update_me")
+PASSWORD = "bench-password"
+
+
+def _configure_environment(args: argparse.Namespace):
+    """Point the app settings at the benchmark database (before importing it).
+
+    A "sqlite" database lives in a temporary directory, removed by
+    `_cleanup_environment` once the run is over.
+    """
+    args.temp_dir = None
+    if args.db == "sqlite":
+        args.temp_dir = tempfile.TemporaryDirectory(prefix="bench-")
+        args.db = f"sqlite+aiosqlite:///{Path(args.temp_dir.name) / 'bench.db'}"
+        args.create_schema = True
+    os.environ["DATABASE_URL"] = args.db
+    os.environ.setdefault("SECRET_KEY", uuid.uuid4().hex)
+    # Verification emails from the register scenario go nowhere
+    os.environ.setdefault("MAIL_BACKEND", "memory")
+    # Every simulated client shares one IP, the login limiter would refuse most of them
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.db.startswith("sqlite") or args.workers == 1:
+        os.environ.setdefault("INVALIDATION_BUS_BACKEND", "local")
+    if args.db.startswith("sqlite"):
+        # Full-text search needs Postgres
+        os.environ.setdefault("SEARCH_BACKEND", "memory")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def _cleanup_environment(args: argparse.Namespace):
+    """Remove the temporary database, with its journal / WAL files"""
+    if args.temp_dir is not None:
+        args.temp_dir.cleanup()
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+async def _drive(
+    make_request: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+    start: int = 0,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = itertools.count(start)
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < start + total:
+            started = time.perf_counter()
+            try:
+                response = await make_request(i)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def _create_schema():
+    from core.db import async_db
+    from models.base import CommonBase
+
+    await async_db.init()
+    async with async_db.engine.begin() as conn:
+        await conn.run_sync(CommonBase.metadata.create_all)
+
+
+async def _seed(users: int) -> tuple[list[str], list[str], str, list[str]]:
+    """Create an admin and `users` regular users directly in the database.
+
+    Returns the user ids, their access tokens, the admin's token and the
+    usernames.
+    """
+    from sqlalchemy import insert
+
+    from api.security import create_access_token, get_password_hash
+    from core.db import async_db
+    from models import UserModel
+    from models.users import RoleEnum
+
+    run_id = uuid.uuid4().hex[:8]
+    hashed = get_password_hash(PASSWORD)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "username": f"bench_{run_id}_{i}",
+            "email": f"bench_{run_id}_{i}@example.com",
+            "password": hashed,
+            "full_name": f"Bench {i}",
+            "role": RoleEnum.USER,
+        }
+        for i in range(users)
+    ]
+    admin = {**rows[0], "id": uuid.uuid4(), "username": f"bench_{run_id}_admin",
+             "email": f"bench_{run_id}_admin@example.com", "role": RoleEnum.ADMIN}
+    async with async_db.get_session() as session:
+        await session.execute(insert(UserModel), [*rows, admin])
+        await session.commit()
+    ids = [str(row["id"]) for row in rows]
+    usernames = [row["username"] for row in rows]
+    return ids, [create_access_token(user_id) for user_id in ids], create_access_token(str(admin["id"])), usernames
+
+
+def _scenario_requests(client: httpx.AsyncClient, prefix: str, ids, tokens, admin_token, usernames):
+    run_id = uuid.uuid4().hex[:8]
+
+    def auth(i: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    return {
+        "register": lambda i: client.post(f"{prefix}/auth/register", json={
+            "username": f"reg_{run_id}_{i}",
+            "email": f"reg_{run_id}_{i}@example.com",
+            "password": PASSWORD,
+            "full_name": f"Registered {i}",
+        }),
+        "login": lambda i: client.post(f"{prefix}/auth/login", data={
+            "username": usernames[i % len(usernames)],
+            "password": PASSWORD,
+        }),
+        "me": lambda i: client.get(f"{prefix}/users/me", headers=auth(i)),
+        "user_by_id": lambda i: client.get(
+            f"{prefix}/users/{ids[i % len(ids)]}",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        ),
+        "update_me": lambda i: client.patch(
+            f"{prefix}/users/me", headers=auth(i), json={"full_name": f"Updated {i}"}
+        ),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_up(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not come up in time")
+
+
+async def _run_scenarios(client: httpx.AsyncClient, args: argparse.Namespace, seed) -> dict:
+    from core.settings import settings
+
+    requests = _scenario_requests(client, settings.API_PREFIX, *seed)
+    results = {}
+    for name in args.scenarios:
+        # Short warm-up so connection setup and first-call costs don't skew p99
+        await _drive(
+            requests[name], min(args.concurrency, args.requests), args.concurrency, start=args.requests
+        )
+        results[name] = await _drive(requests[name], args.requests, args.concurrency)
+        print(f"{name:>12}: {results[name]}", file=sys.stderr)
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from core.db import async_db
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.create_schema:
+        await _create_schema()
+
+    if args.target == "asgi":
+        from main import app
+
+        async with app.router.lifespan_context(app):
+            seed = await _seed(args.users)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                await _wait_until_up(client)
+                results = await _run_scenarios(client, args, seed)
+    else:
+        await async_db.init()
+        try:
+            seed = await _seed(args.users)
+        finally:
+            await async_db.close()
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=os.environ.copy(),
+        )
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout
+            ) as client:
+                await _wait_until_up(client)
+                results = await _run_scenarios(client, args, seed)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": args.target,
+            "workers": args.workers,
+            "database": args.db.split("://", 1)[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    """Return a description of every scenario that regressed beyond `threshold`"""
+    regressions = []
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            continue
+        if base_result["throughput_rps"]:
+            change = head_result["throughput_rps"] / base_result["throughput_rps"] - 1
+            if change < -threshold:
+                regressions.append(
+                    f"{name}: throughput {base_result['throughput_rps']} -> "
+                    f"{head_result['throughput_rps']} rps ({change:+.1%})"
+                )
+        if base_result["p95_ms"]:
+            change = head_result["p95_ms"] / base_result["p95_ms"] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{name}: p95 {base_result['p95_ms']} -> {head_result['p95_ms']} ms ({change:+.1%})"
+                )
+        if head_result["errors"] > base_result["errors"]:
+            regressions.append(f"{name}: errors {base_result['errors']} -> {head_result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.run")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmark scenarios")
+    run_parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    run_parser.add_argument("--db", default="sqlite", help='"sqlite" or an async SQLAlchemy URL')
+    run_parser.add_argument("--create-schema", action="store_true", help="Create tables before seeding")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+    run_parser.add_argument("--users", type=int, default=100, help="Users to seed")
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument("--output", help="Write results to this JSON file (default: stdout)")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.base) as base, open(args.head) as head:
+            regressions = compare(json.load(base), json.load(head), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print("No regressions")
+        sys.exit(1 if regressions else 0)
+
+    _configure_environment(args)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        _cleanup_environment(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
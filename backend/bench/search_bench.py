@@ -0,0 +1,210 @@
+"""Latency benchmarks for article search at scale.
+
+Indexes a synthetic corpus (Zipf-distributed vocabulary, so there are both
+very common and very rare terms) and times ranked queries of each kind:
+
+    python -m bench.search_bench --backend memory --docs 1000000
+    python -m bench.search_bench --backend postgres --docs 1000000 \\
+        --db postgresql+asyncpg://u:p@localhost/bench --create-schema
+
+The postgres run seeds `--docs` published articles under one bench author,
+builds their search vectors and ANALYZEs before timing anything.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+QUERY_KINDS = ("common_term", "rare_term", "two_terms", "prefix")
+
+
+class Corpus:
+    def __init__(self, vocabulary: int, seed: int):
+        self._random = random.Random(seed)
+        syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(self._random.choices(syllables, k=self._random.randint(2, 4))))
+        self.words = sorted(words, key=lambda _: self._random.random())
+        self._cumulative = list(itertools.accumulate(1 / (rank + 1) ** 1.1 for rank in range(vocabulary)))
+
+    def text(self, length: int) -> str:
+        return " ".join(self._random.choices(self.words, cum_weights=self._cumulative, k=length))
+
+    def document(self, body_words: int) -> tuple[str, str]:
+        return self.text(6), self.text(body_words)
+
+    def queries(self, kind: str, count: int) -> list[str]:
+        common = self.words[:20]
+        rare = self.words[len(self.words) // 2:]
+        if kind == "common_term":
+            return [self._random.choice(common) for _ in range(count)]
+        if kind == "rare_term":
+            return [self._random.choice(rare) for _ in range(count)]
+        if kind == "two_terms":
+            return [f"{self._random.choice(common)} {self._random.choice(self.words[:2000])}" for _ in range(count)]
+        return [self._random.choice(self.words[:5000])[:3] for _ in range(count)]
+
+
+def _summarize(latencies: list[float]) -> dict:
+    latencies.sort()
+
+    def percentile(q: float) -> float:
+        return round(latencies[max(int(q * len(latencies)) - 1, 0)] * 1000, 3)
+
+    return {
+        "queries": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def _time_queries(search, corpus: Corpus, args) -> dict:
+    results = {}
+    for kind in QUERY_KINDS:
+        latencies = []
+        for query in corpus.queries(kind, args.queries):
+            started = time.perf_counter()
+            await search(query, prefix=kind == "prefix")
+            latencies.append(time.perf_counter() - started)
+        results[kind] = _summarize(latencies)
+        print(f"{kind:>12}: {results[kind]}", file=sys.stderr)
+    return results
+
+
+async def run_memory(corpus: Corpus, args) -> dict:
+    from core.search import InvertedIndex
+
+    index = InvertedIndex(args.prefix_expansions)
+    started = time.perf_counter()
+    for number in range(args.docs):
+        title, body = corpus.document(args.body_words)
+        index.add(number, ((title, 3.0), (body, 1.0)))
+        if number and number % 100000 == 0:
+            print(f"indexed {number} documents", file=sys.stderr)
+    build_seconds = time.perf_counter() - started
+
+    async def search(query: str, prefix: bool):
+        return index.search(query, args.limit, prefix=prefix)
+
+    return {
+        "build_seconds": round(build_seconds, 1),
+        "vocabulary": index.vocabulary_size,
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "queries": await _time_queries(search, corpus, args),
+    }
+
+
+async def run_postgres(corpus: Corpus, args) -> dict:
+    from sqlalchemy import insert, text
+
+    from core.db import async_db
+    from models import ArticleModel, UserModel
+    from models.articles import ArticleStatusEnum
+    from models.base import CommonBase
+    from models.users import RoleEnum
+    from ops.article_search import PostgresSearchBackend
+
+    backend = PostgresSearchBackend()
+    await async_db.init()
+    try:
+        if args.create_schema:
+            async with async_db.engine.begin() as conn:
+                await conn.run_sync(CommonBase.metadata.create_all)
+
+        author_id = uuid.uuid4()
+        started = time.perf_counter()
+        async with async_db.get_session() as db:
+            await db.execute(insert(UserModel).values(
+                id=author_id, username=f"search_{author_id.hex[:8]}", email=f"search_{author_id.hex[:8]}@example.com",
+                password="!", role=RoleEnum.AUTHOR,
+            ))
+            for offset in range(0, args.docs, args.batch_size):
+                rows = []
+                for _ in range(min(args.batch_size, args.docs - offset)):
+                    article_id = uuid.uuid4()
+                    title, body = corpus.document(args.body_words)
+                    rows.append({
+                        "id": article_id, "author_id": author_id, "slug": article_id.hex,
+                        "title": title, "body": body, "status": ArticleStatusEnum.PUBLISHED,
+                        "published_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                    })
+                await db.execute(insert(ArticleModel), rows)
+                await db.commit()
+                print(f"inserted {offset + len(rows)} articles", file=sys.stderr)
+            await backend.author_changed(db, author_id)
+            await db.commit()
+        async with async_db.engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("ANALYZE articles"))
+        build_seconds = time.perf_counter() - started
+
+        async with async_db.get_session() as db:
+            async def search(query: str, prefix: bool):
+                return await backend.search(db, query, args.limit, prefix=prefix)
+
+            queries = await _time_queries(search, corpus, args)
+    finally:
+        await async_db.close()
+    return {"build_seconds": round(build_seconds, 1), "queries": queries}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.search_bench")
+    parser.add_argument("--backend", choices=("memory", "postgres"), default="memory")
+    parser.add_argument("--db", help="Async SQLAlchemy URL (postgres backend)")
+    parser.add_argument("--create-schema", action="store_true", help="Create tables before seeding")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--body-words", type=int, default=60)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per kind")
+    parser.add_argument("--limit", type=int, default=20, help="Results per query")
+    parser.add_argument("--prefix-expansions", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per insert (postgres backend)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results to this JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.backend == "postgres":
+        if not args.db:
+            parser.error("--db is required for the postgres backend")
+        os.environ["DATABASE_URL"] = args.db
+        os.environ.setdefault("SECRET_KEY", uuid.uuid4().hex)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    corpus = Corpus(args.vocabulary, args.seed)
+    runner = run_memory if args.backend == "memory" else run_postgres
+    results = {
+        "meta": {
+            "backend": args.backend,
+            "docs": args.docs,
+            "body_words": args.body_words,
+            "vocabulary": args.vocabulary,
+            "limit": args.limit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+        },
+        **asyncio.run(runner(corpus, args)),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""CPU benchmark for large list responses: FastAPI's response_model path
+against api.serialization (validated and trusted).
+
+Serializes in-memory pages of users (ORM objects, as `GET /users` returns
+them) and article feed items (dicts built from rows, as the feeds return
+them), so the numbers are pure encoding cost, no database or HTTP:
+
+    python -m bench.serialization_bench --items 1000 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODES = ("fastapi", "validated", "trusted")
+
+
+def _users(count: int):
+    from models import UserModel
+    from models.users import RoleEnum
+
+    now = datetime(2026, 1, 1)
+    return [
+        UserModel(
+            id=uuid.uuid4(),
+            username=f"user{index}",
+            email=f"user{index}@example.com",
+            full_name=f"User Number {index}",
+            password="not-serialized",
+            role=RoleEnum.USER,
+            is_verified=index % 2 == 0,
+            created_at=now + timedelta(seconds=index),
+            updated_at=now + timedelta(seconds=index, microseconds=index),
+        )
+        for index in range(count)
+    ]
+
+
+def _feed_items(count: int):
+    now = datetime(2026, 1, 1)
+    return [
+        {
+            "id": uuid.uuid4(),
+            "slug": f"article-{index}",
+            "title": f"Article number {index} about serialization",
+            "summary": "A short summary of the article that shows up in feeds." * 2,
+            "author_id": uuid.uuid4(),
+            "author_username": f"author{index % 50}",
+            "published_at": now + timedelta(minutes=index),
+            "tags": ["python", "performance", f"tag{index % 10}"],
+        }
+        for index in range(count)
+    ]
+
+
+def _route(path: str, response_model):
+    from fastapi.routing import APIRoute
+
+    async def endpoint():
+        return None
+    return APIRoute(path, endpoint, response_model=response_model)
+
+
+async def _fastapi_path(route, payload) -> bytes:
+    # What APIRoute does with a returned dict: validate + serialize, then json.dumps
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    content = await serialize_response(field=route.secure_cloned_response_field, response_content=payload)
+    return JSONResponse(content).body
+
+
+async def _time(fn, rounds: int) -> dict:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "min_ms": round(timings[0] * 1000, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from api.dto.res.article import ArticleFeedRes
+    from api.dto.res.user import UserListRes
+    from api.serialization import encode, orjson
+
+    cases = {
+        "users": (UserListRes, {"items": _users(args.items), "next_cursor": "x" * 40}),
+        "article_feed": (ArticleFeedRes, {"items": _feed_items(args.items), "next_cursor": "x" * 40}),
+    }
+    results = {}
+    for case, (model, payload) in cases.items():
+        route = _route(f"/{case}", model)
+        reference = await _fastapi_path(route, payload)
+        for mode in ("validated", "trusted"):
+            if encode(model, payload, trusted=mode == "trusted") != reference:
+                raise SystemExit(f"{case}: {mode} output differs from FastAPI's")
+        runners = {
+            "fastapi": lambda: _fastapi_path(route, payload),
+            "validated": lambda: asyncio.sleep(0, encode(model, payload)),
+            "trusted": lambda: asyncio.sleep(0, encode(model, payload, trusted=True)),
+        }
+        results[case] = {}
+        for mode in MODES:
+            await runners[mode]()  # warm up adapters and caches
+            results[case][mode] = await _time(runners[mode], args.rounds)
+            print(f"{case:>13} {mode:>9}: {results[case][mode]}", file=sys.stderr)
+    return {
+        "items": args.items,
+        "orjson": orjson is not None,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Items per response page")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", uuid.uuid4().hex)
+    sys.path.insert(0, str(BACKEND_DIR))
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""User maintenance commands.
+
+    python -m cli.users export --format ndjson > users.ndjson
+    python -m cli.users import users.csv --format csv --report errors.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from api.user_io import (
+    EXPORT_FORMATS, IMPORT_FORMATS, IMPORT_MAX_BATCH_SIZE, ExportStats, export_users, import_users,
+)
+from core.db import async_db
+
+
+async def run_export(args: argparse.Namespace):
+    stats = ExportStats()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    await async_db.init()
+    try:
+        async for chunk in export_users(args.format, args.batch_size, stats):
+            output.write(chunk)
+    finally:
+        await async_db.close()
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+    print(
+        f"Exported {stats.rows} users in {stats.elapsed:.2f}s "
+        f"({stats.rows_per_second:.0f} rows/s)",
+        file=sys.stderr,
+    )
+
+
+async def _read_file(path: str, chunk_size: int = 1 << 20):
+    with open(path, "rb") as source:
+        while chunk := source.read(chunk_size):
+            yield chunk
+
+
+def _import_batch_size(value: str) -> int:
+    size = int(value)
+    if not 1 <= size <= IMPORT_MAX_BATCH_SIZE:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {IMPORT_MAX_BATCH_SIZE}")
+    return size
+
+
+async def run_import(args: argparse.Namespace):
+    workers = args.workers or os.cpu_count() or 1
+    await async_db.init()
+    try:
+        # Use every core for bcrypt, there are no logins to compete with here
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            async with async_db.get_session() as session:
+                report = await import_users(
+                    session,
+                    _read_file(args.path),
+                    args.format,
+                    args.batch_size,
+                    executor=executor,
+                    workers=workers,
+                )
+    finally:
+        await async_db.close()
+    if args.report:
+        with open(args.report, "w") as output:
+            output.write(report.model_dump_json(indent=2))
+    print(f"Inserted {report.inserted} users, {report.failed} failed", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m cli.users")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Stream all users as NDJSON or CSV")
+    export.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    export.add_argument("--batch-size", type=int, default=1000)
+    export.add_argument("--output", help="Write to this file instead of stdout")
+    export.set_defaults(handler=run_export)
+
+    import_ = commands.add_parser("import", help="Bulk-create users from NDJSON or CSV")
+    import_.add_argument("path")
+    import_.add_argument("--format", choices=IMPORT_FORMATS, default="ndjson")
+    import_.add_argument("--batch-size", type=_import_batch_size, default=1000)
+    import_.add_argument("--workers", type=int, help="Hashing processes (default: all cores)")
+    import_.add_argument("--report", help="Write the per-row error report to this JSON file")
+    import_.set_defaults(handler=run_import)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from sqlalchemy import ARRAY, Text, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with the invalidated key, or None when every entry must be dropped
+InvalidationHandler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus(ABC):
+    """Fans cache invalidations out to every worker process"""
+
+    def __init__(self):
+        self._handlers: dict[str, list[InvalidationHandler]] = {}
+        self._origin = uuid.uuid4().hex
+        self.published = 0
+        self.delivered = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+
+    def subscribe(self, namespace: str, handler: InvalidationHandler):
+        self._handlers.setdefault(namespace, []).append(handler)
+
+    @abstractmethod
+    async def publish(self, db: AsyncSession, namespace: str, key: str):
+        """Announce that `key` in `namespace` changed.
+
+        Call this before committing `db` so backends that ride on the
+        transaction only deliver once the write is visible.
+        """
+
+    async def publish_many(self, db: AsyncSession, namespace: str, keys: list[str]):
+        """Announce several changed keys, see `publish`"""
+        for key in keys:
+            await self.publish(db, namespace, key)
+
+    async def start(self):
+        """Start receiving invalidations (call this at startup)"""
+
+    async def stop(self):
+        """Stop receiving invalidations (call this at shutdown)"""
+
+    def _encode(self, namespace: str, key: str) -> str:
+        self.published += 1
+        return json.dumps({"ns": namespace, "key": key, "origin": self._origin, "ts": time.time()})
+
+    def _deliver(self, payload: str, skip_own: bool = False):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation payload: %r", payload)
+            return
+        if skip_own and message.get("origin") == self._origin:
+            return
+        lag = max(time.time() - message.get("ts", time.time()), 0.0)
+        self.delivered += 1
+        self.lag_seconds_total += lag
+        self.lag_seconds_max = max(self.lag_seconds_max, lag)
+        for handler in self._handlers.get(message.get("ns"), []):
+            handler(message.get("key"))
+
+    def _flush_all(self):
+        for handlers in self._handlers.values():
+            for handler in handlers:
+                handler(None)
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """In-process bus for tests and single-worker deployments"""
+
+    async def publish(self, db: AsyncSession, namespace: str, key: str):
+        self._deliver(self._encode(namespace, key))
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """Bus over Postgres LISTEN/NOTIFY on the application's asyncpg engine"""
+
+    def __init__(self, channel: str, reconnect_delay: float = 1.0):
+        super().__init__()
+        self._channel = channel
+        self._reconnect_delay = reconnect_delay
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, db: AsyncSession, namespace: str, key: str):
+        # NOTIFY is transactional: listeners only see it once `db` commits
+        await db.execute(select(func.pg_notify(self._channel, self._encode(namespace, key))))
+
+    async def publish_many(self, db: AsyncSession, namespace: str, keys: list[str]):
+        if not keys:
+            return
+        payload = func.unnest(
+            cast([self._encode(namespace, key) for key in keys], ARRAY(Text))
+        ).table_valued("payload")
+        await db.execute(select(func.pg_notify(self._channel, payload.c.payload)))
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._deliver(payload, skip_own=True)
+
+    async def _listen(self):
+        connected_before = False
+        while True:
+            try:
+                async with async_db.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    lost = asyncio.Event()
+                    driver.add_termination_listener(lambda _: lost.set())
+                    await driver.add_listener(self._channel, self._on_notify)
+                    try:
+                        if connected_before:
+                            # Anything published while we were away is lost
+                            self._flush_all()
+                        connected_before = True
+                        await lost.wait()
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(self._channel, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Invalidation listener failed, reconnecting")
+            self._flush_all()
+            await asyncio.sleep(self._reconnect_delay)
+
+
+def create_invalidation_bus() -> InvalidationBus:
+    if settings.INVALIDATION_BUS_BACKEND == "postgres":
+        return PostgresInvalidationBus(settings.INVALIDATION_BUS_CHANNEL)
+    if settings.INVALIDATION_BUS_BACKEND == "local":
+        return LocalInvalidationBus()
+    raise ValueError(f"Unknown invalidation bus backend: {settings.INVALIDATION_BUS_BACKEND}")
+
+
+# Global instance
+invalidation_bus = create_invalidation_bus()
+
+metrics.callback(
+    "invalidation_bus_published_total", "Invalidations published by this worker", "counter",
+    lambda: invalidation_bus.published,
+)
+metrics.callback(
+    "invalidation_bus_delivered_total", "Invalidations received by this worker", "counter",
+    lambda: invalidation_bus.delivered,
+)
+metrics.callback(
+    "invalidation_bus_lag_seconds_total", "Summed publish-to-delivery lag", "counter",
+    lambda: invalidation_bus.lag_seconds_total,
+)
+metrics.callback(
+    "invalidation_bus_lag_seconds_max", "Largest publish-to-delivery lag seen", "gauge",
+    lambda: invalidation_bus.lag_seconds_max,
+)
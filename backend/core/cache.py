@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from core.metrics import metrics
+from core.settings import settings
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped on every invalidation, see `set`"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Store a value.
+
+        Pass the `generation` read before loading the value to drop the write
+        if an invalidation happened in the meantime, so a slow reader can't
+        put back data that a concurrent write has just replaced.
+        """
+        if generation is not None and generation != self._generation:
+            return
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._data.clear()
+
+
+# Snapshots of authenticated users, keyed by str(user id)
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+metrics.callback("user_cache_hits_total", "Authenticated user cache hits", "counter", lambda: user_cache.hits)
+metrics.callback("user_cache_misses_total", "Authenticated user cache misses", "counter", lambda: user_cache.misses)
+metrics.callback("user_cache_size", "Authenticated users currently cached", "gauge", lambda: len(user_cache))
+
+# Users written recently, whose reads should skip possibly lagging replicas
+recent_user_writes = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.DB_REPLICA_STICKY_SECONDS,
+)
+
+
+def invalidate_user(user_id: Optional[str]):
+    """Drop a cached user (every user when None) after it was written"""
+    if user_id is None:
+        user_cache.clear()
+        return
+    user_cache.invalidate(user_id)
+    recent_user_writes.set(user_id, True)
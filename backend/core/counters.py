@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Hashable, Optional
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Receives {key: {field: increment}} and writes it out
+FlushHandler = Callable[[dict[Hashable, dict[str, int]]], Awaitable[None]]
+
+counter_flushes = metrics.counter("counter_buffer_flushes_total", "Counter buffer flushes, by outcome")
+counter_flushed_keys = metrics.counter("counter_buffer_flushed_keys_total", "Keys written by counter buffer flushes")
+counter_dropped = metrics.counter(
+    "counter_buffer_dropped_increments_total", "Increments dropped because the buffer was full"
+)
+counter_flush_lag = metrics.histogram(
+    "counter_buffer_flush_lag_seconds", "Age of the oldest increment when its flush completed",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+_buffers: list["CounterBuffer"] = []
+
+
+class CounterBuffer:
+    """Aggregates counter increments in memory and writes them behind, in batches.
+
+    Increments for the same key are summed until the next flush, which runs
+    every `interval` seconds (or early once `max_keys` keys are pending). A
+    failed flush puts its increments back for the next attempt. When the
+    buffer is full, increments for new keys are dropped and counted rather
+    than growing memory.
+    """
+
+    def __init__(self, name: str, flush: FlushHandler, interval: float, max_keys: int):
+        self.name = name
+        self._flush_handler = flush
+        self._interval = interval
+        self._max_keys = max_keys
+        self._pending: dict[Hashable, dict[str, int]] = {}
+        self._oldest: Optional[float] = None
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        _buffers.append(self)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def oldest_pending_seconds(self) -> float:
+        return time.monotonic() - self._oldest if self._oldest is not None else 0.0
+
+    def add(self, key: Hashable, **increments: int) -> bool:
+        """Buffer increments for `key`. False if they were dropped"""
+        counts = self._pending.get(key)
+        if counts is None:
+            if len(self._pending) >= self._max_keys:
+                counter_dropped.inc(sum(increments.values()), buffer=self.name)
+                self._full.set()
+                return False
+            counts = self._pending[key] = {}
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        for field, amount in increments.items():
+            counts[field] = counts.get(field, 0) + amount
+        if len(self._pending) >= self._max_keys:
+            self._full.set()
+        return True
+
+    def pending(self, key: Hashable) -> dict[str, int]:
+        """Increments for `key` not written yet"""
+        return dict(self._pending.get(key, {}))
+
+    def _restore(self, batch: dict[Hashable, dict[str, int]], oldest: float):
+        for key, increments in batch.items():
+            counts = self._pending.get(key)
+            if counts is None:
+                if len(self._pending) >= self._max_keys:
+                    counter_dropped.inc(sum(increments.values()), buffer=self.name)
+                    continue
+                counts = self._pending[key] = {}
+            for field, amount in increments.items():
+                counts[field] = counts.get(field, 0) + amount
+        if self._pending:
+            self._oldest = min(oldest, self._oldest or oldest)
+
+    async def flush(self) -> bool:
+        """Write out everything buffered so far. False if the write failed"""
+        async with self._lock:
+            if not self._pending:
+                return True
+            batch, oldest = self._pending, self._oldest
+            self._pending, self._oldest = {}, None
+            self._full.clear()
+            try:
+                await self._flush_handler(batch)
+            except Exception:
+                counter_flushes.inc(buffer=self.name, outcome="error")
+                logger.exception("Flushing %d %s counters failed, keeping them for the next flush", len(batch), self.name)
+                self._restore(batch, oldest)
+                return False
+            counter_flushes.inc(buffer=self.name, outcome="ok")
+            counter_flushed_keys.inc(len(batch), buffer=self.name)
+            counter_flush_lag.observe(time.monotonic() - oldest, buffer=self.name)
+            return True
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+            if not await self.flush() and not self._stopping:
+                # Don't hammer a struggling database, even with a full buffer
+                await asyncio.sleep(self._interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write out what is left (call this at shutdown)"""
+        # Let an in-flight flush finish rather than cancelling it halfway
+        if self._task is not None:
+            self._stopping = True
+            self._full.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+
+def _buffer_stats(read: Callable[[CounterBuffer], float]):
+    def collect():
+        return {(("buffer", buffer.name),): read(buffer) for buffer in _buffers}
+    return collect
+
+
+metrics.callback("counter_buffer_pending_keys", "Keys waiting to be flushed", "gauge", _buffer_stats(len))
+metrics.callback(
+    "counter_buffer_oldest_pending_seconds", "Age of the oldest unflushed increment", "gauge",
+    _buffer_stats(lambda buffer: buffer.oldest_pending_seconds),
+)
@@ -1,30 +1,84 @@
-from contextlib import asynccontextmanager
-from typing import Optional
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import itertools
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Awaitable, Callable, Optional
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from core.instrumentation import InstrumentedQueuePool, forget_engine, instrument_engine
 from core.settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+class _Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        self.down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    @property
+    def checked_out(self) -> int:
+        return self.engine.pool.checkedout()
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+
+
 class AsyncDatabaseSession:
     def __init__(self):
         self._sessionmaker = None
         self._engine = None
-        
+        self._replicas: list[_Replica] = []
+        self._round_robin = itertools.count()
+
+    @staticmethod
+    def _create_engine(name: str, db_url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+        engine = create_async_engine(
+            db_url,
+            future=True,
+            echo=settings.DB_ECHO,
+            poolclass=InstrumentedQueuePool,
+            pool_logging_name=name,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+        instrument_engine(engine, name)
+        return engine
+
     async def init(self):
         """Initialize the engine and sessionmaker (call this once at startup)"""
         if self._engine is None:
             db_url = str(settings.async_db_url)
-            self._engine = create_async_engine(
-                db_url,
-                future=True,
-                echo=True,
-                pool_size=20,
-                max_overflow=10,
-                pool_timeout=30,
+            self._engine = self._create_engine(
+                "primary", db_url, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
             )
             self._sessionmaker = async_sessionmaker(
                 self._engine, expire_on_commit=False
             )
-    
+            self._replicas = [
+                _Replica(self._create_engine(
+                    f"replica{index}", url,
+                    settings.DB_REPLICA_POOL_SIZE, settings.DB_REPLICA_MAX_OVERFLOW,
+                ))
+                for index, url in enumerate(settings.DB_REPLICA_URLS)
+            ]
+
+    @property
+    def engine(self):
+        """The initialized async engine"""
+        if self._engine is None:
+            raise RuntimeError("Engine is not initialized. Ensure 'init()' is called first.")
+        return self._engine
+
     @asynccontextmanager
     async def get_session(self):
         """Async context manager that yields a session"""
@@ -33,18 +87,114 @@ class AsyncDatabaseSession:
         if not self._sessionmaker:
             raise RuntimeError("Sessionmaker is not initialized. Ensure 'init()' is called before using 'get_session'.")
         session = self._sessionmaker()
-        
+
         try:
             yield session
         finally:
             await session.close()
-        
+
+    def _replica_candidates(self) -> list[_Replica]:
+        replicas = [replica for replica in self._replicas if replica.available]
+        if not replicas:
+            return []
+        # Rotate first so ties (and the round robin strategy) spread the load
+        offset = next(self._round_robin) % len(replicas)
+        replicas = replicas[offset:] + replicas[:offset]
+        if settings.DB_REPLICA_STRATEGY == "least_connections":
+            replicas.sort(key=lambda replica: replica.checked_out)
+        return replicas
+
+    @asynccontextmanager
+    async def get_read_session(self):
+        """Async context manager that yields a session for read-only work.
+
+        Uses a read replica when any are configured and reachable, and falls
+        back to the primary otherwise. A replica that fails to connect is
+        skipped for DB_REPLICA_RETRY_SECONDS.
+        """
+        if not self._sessionmaker:
+            await self.init()
+        for replica in self._replica_candidates():
+            session = replica.sessionmaker()
+            try:
+                # Connect up front so a dead replica can still fall back
+                await session.connection()
+            except (SQLAlchemyError, OSError):
+                logger.warning("Read replica %s unavailable", replica.engine.url, exc_info=True)
+                replica.mark_down()
+                await session.close()
+                continue
+            try:
+                yield session
+            except DBAPIError as exc:
+                if exc.connection_invalidated:
+                    replica.mark_down()
+                raise
+            finally:
+                await session.close()
+            return
+
+        async with self.get_session() as session:
+            yield session
+
+    async def warm_up(
+        self,
+        connections: int,
+        prepare: Optional[Callable[[AsyncSession], Awaitable[None]]] = None,
+    ):
+        """Open `connections` pooled connections on every engine and run
+        `prepare` on each, so connection setup, type introspection and
+        statement preparation happen before the first request does.
+
+        Only the primary has to succeed. A replica that can't be warmed is
+        marked down and reads go elsewhere until it is retried.
+        """
+        if not self._sessionmaker:
+            await self.init()
+        await self._warm_engine(self._engine, connections, prepare)
+        for index, replica in enumerate(self._replicas):
+            try:
+                await self._warm_engine(replica.engine, connections, prepare)
+            except Exception:
+                replica.mark_down()
+                logger.warning("Warming up replica%s failed, marking it down", index, exc_info=True)
+
+    @staticmethod
+    async def _warm_engine(
+        engine: AsyncEngine,
+        connections: int,
+        prepare: Optional[Callable[[AsyncSession], Awaitable[None]]],
+    ):
+        # Hold them all at once, otherwise the pool hands back the same one
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                conn = await stack.enter_async_context(engine.connect())
+                if prepare is not None:
+                    async with AsyncSession(bind=conn) as session:
+                        await prepare(session)
+
     async def close(self):
         """Close the engine (call this at shutdown)"""
+        for index, replica in enumerate(self._replicas):
+            await replica.engine.dispose()
+            forget_engine(f"replica{index}")
+        self._replicas = []
         if self._engine:
             await self._engine.dispose()
+            forget_engine("primary")
             self._engine = None
             self._sessionmaker = None
 
+async def release_connection(session: AsyncSession):
+    """Hand the session's pooled connection back as soon as the caller is done
+    with the database, instead of at the end of the request.
+
+    Loaded objects stay usable (they're detached, not expired) and the
+    session checks out a new connection if it is used again. Sessions with
+    unflushed changes are left alone so nothing gets silently discarded.
+    """
+    if session.in_transaction() and not (session.new or session.dirty or session.deleted):
+        await session.close()
+
 # Global instance
-async_db = AsyncDatabaseSession()
\ No newline at end of file
+async_db = AsyncDatabaseSession()
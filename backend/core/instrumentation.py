@@ -0,0 +1,185 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.metrics import metrics
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+db_queries = metrics.counter("db_queries_total", "Statements executed")
+db_query_errors = metrics.counter("db_query_errors_total", "Statements that raised")
+db_query_duration = metrics.histogram("db_query_duration_seconds", "Statement execution time")
+db_pool_wait = metrics.histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+db_connection_hold = metrics.histogram(
+    "db_connection_hold_seconds", "Time a connection stayed checked out of the pool",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+db_connection_hold_exceeded = metrics.counter(
+    "db_connection_hold_exceeded_total", "Connections held longer than DB_CONNECTION_HOLD_WARN_MS"
+)
+http_requests = metrics.histogram("http_request_duration_seconds", "Request handling time")
+http_request_queries = metrics.histogram(
+    "http_request_db_queries", "Statements executed per request",
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+
+_engines: dict[str, AsyncEngine] = {}
+
+
+class RequestDbStats:
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.query_time = 0.0
+
+    @property
+    def route(self) -> str:
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+# Stats of the request being handled, None outside of requests
+_request_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestDbStats]:
+    return _request_stats.get()
+
+
+def _redact(parameters) -> str:
+    """Describe bound parameters without leaking their values"""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: ?" for key in parameters) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return "(" + ", ".join("?" for _ in parameters) + ")"
+    return "?"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, engine=self._orig_logging_name or "primary")
+
+
+def instrument_engine(engine: AsyncEngine, name: str):
+    """Attach query timing and pool hold-time hooks to `engine`"""
+    _engines[name] = engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        db_queries.inc(engine=name)
+        db_query_duration.observe(elapsed, engine=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+        if (
+            elapsed * 1000 >= settings.DB_SLOW_QUERY_MS
+            and random.random() < settings.DB_SLOW_QUERY_SAMPLE_RATE
+        ):
+            logger.warning(
+                "Slow query on %s (%.1f ms): %s params=%s",
+                name, elapsed * 1000, " ".join(statement.split()), _redact(parameters),
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        db_query_errors.inc(engine=name)
+        started = context.connection.info.get("query_started_at") if context.connection else None
+        if started:
+            started.pop()
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return
+        held = time.perf_counter() - checked_out_at
+        db_connection_hold.observe(held, engine=name)
+        if held * 1000 >= settings.DB_CONNECTION_HOLD_WARN_MS:
+            stats = _request_stats.get()
+            route = stats.route if stats is not None else "background"
+            db_connection_hold_exceeded.inc(engine=name, route=route)
+            logger.warning("%s held a %s connection for %.1f ms", route, name, held * 1000)
+
+
+def forget_engine(name: str):
+    _engines.pop(name, None)
+
+
+def _pool_stats(attribute: str):
+    def collect():
+        values = {}
+        for name, engine in _engines.items():
+            pool = engine.pool
+            if attribute == "saturation":
+                capacity = pool.size() + max(pool._max_overflow, 0)
+                value = pool.checkedout() / capacity if capacity else 0.0
+            else:
+                value = getattr(pool, attribute)()
+            values[(("engine", name),)] = value
+        return values
+    return collect
+
+
+metrics.callback("db_pool_size", "Configured pool size", "gauge", _pool_stats("size"))
+metrics.callback("db_pool_checked_out", "Connections currently checked out", "gauge", _pool_stats("checkedout"))
+metrics.callback("db_pool_overflow", "Connections opened beyond the pool size", "gauge", _pool_stats("overflow"))
+metrics.callback(
+    "db_pool_saturation", "Checked out connections over pool size plus overflow", "gauge",
+    _pool_stats("saturation"),
+)
+
+
+class RequestMetricsMiddleware:
+    """Times each request and counts the statements it ran.
+
+    Requests that run DB_REQUEST_QUERY_WARN statements or more are logged,
+    which is how N+1 query patterns show up.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestDbStats(scope)
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_stats.reset(token)
+            route = stats.route
+            http_requests.observe(time.perf_counter() - started, method=scope["method"], route=route)
+            http_request_queries.observe(stats.queries, route=route)
+            if stats.queries >= settings.DB_REQUEST_QUERY_WARN:
+                logger.warning(
+                    "%s %s ran %d queries (%.1f ms in the database)",
+                    scope["method"], route, stats.queries, stats.query_time * 1000,
+                )
@@ -0,0 +1,303 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.bus import invalidation_bus
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from models import JobModel
+
+logger = logging.getLogger(__name__)
+
+jobs_run = metrics.counter("jobs_total", "Queued jobs run, by job and outcome (ok, retry, failed)")
+job_duration = metrics.histogram("job_duration_seconds", "Queued job run time")
+job_wait = metrics.histogram("job_wait_seconds", "Time from a job being due to it starting")
+
+# Called with the job's JSON payload. Jobs can run more than once (a retry
+# after a timeout, a worker dying mid-job), so handlers must be idempotent.
+JobHandler = Callable[[dict], Awaitable[Any]]
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the `attempts`-th failure, jittered so
+    jobs that failed together don't all come back at once"""
+    ceiling = min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class JobQueue(ABC):
+    """Runs named jobs outside of requests, at most `concurrency` at once per
+    worker, retrying failures with backoff up to `max_attempts` times."""
+
+    def __init__(self, concurrency: int, max_attempts: int):
+        self._handlers: dict[str, JobHandler] = {}
+        self._concurrency = concurrency
+        self.max_attempts = max_attempts
+        self._running: set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def task(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """Decorator registering the handler for jobs called `name`"""
+        def register(handler: JobHandler) -> JobHandler:
+            self._handlers[name] = handler
+            return handler
+        return register
+
+    @property
+    @abstractmethod
+    def depth(self) -> int:
+        """Jobs due and waiting for a slot"""
+
+    @abstractmethod
+    async def enqueue(self, db: AsyncSession, name: str, payload: dict, delay: float = 0):
+        """Queue a job once `db`'s transaction commits (call before committing)"""
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self, timeout: float = 30):
+        """Stop taking jobs and give the running ones `timeout` seconds to finish"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._running:
+            _, unfinished = await asyncio.wait(self._running, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning("Cancelled %d running jobs at shutdown", len(unfinished))
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def _free_slots(self) -> int:
+        return self._concurrency - len(self._running)
+
+    @abstractmethod
+    async def _dispatch(self) -> Optional[float]:
+        """Start due jobs in the free slots. Returns how long to sleep at most,
+        a finished job or a new one wakes the loop earlier."""
+
+    async def _dispatch_loop(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                timeout = await self._dispatch()
+            except Exception:
+                logger.exception("Dispatching jobs failed, retrying")
+                timeout = 1
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, coro: Awaitable):
+        task = asyncio.create_task(coro)
+        self._running.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        # A slot is free again
+        self._wake.set()
+
+    async def _execute(self, name: str, payload: dict, due: float) -> Optional[str]:
+        """Run one attempt, returning the error when it failed"""
+        started = time.time()
+        job_wait.observe(max(started - due, 0), job=name)
+        try:
+            handler = self._handlers.get(name)
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name!r}")
+            await asyncio.wait_for(handler(payload), settings.JOBS_TIMEOUT_SECONDS)
+        except Exception as exc:
+            logger.warning("Job %s failed: %r", name, exc)
+            return repr(exc)
+        finally:
+            job_duration.observe(time.time() - started, job=name)
+        jobs_run.inc(job=name, outcome="ok")
+        return None
+
+    def _failed(self, name: str, attempts: int, error: str) -> Optional[float]:
+        """Delay before retrying, or None when the job is out of attempts"""
+        if attempts >= self.max_attempts:
+            jobs_run.inc(job=name, outcome="failed")
+            logger.error("Job %s failed for good after %d attempts: %s", name, attempts, error)
+            return None
+        jobs_run.inc(job=name, outcome="retry")
+        return retry_delay(attempts)
+
+
+class MemoryJobQueue(JobQueue):
+    """Jobs in a per-process heap, for tests and single-worker deployments.
+
+    Nothing survives a restart: jobs still queued (or waiting for a retry)
+    when the drain at shutdown times out are lost.
+    """
+
+    def __init__(self, concurrency: int, max_attempts: int):
+        super().__init__(concurrency, max_attempts)
+        # (due timestamp, sequence, name, payload, attempts so far)
+        self._heap: list[tuple[float, int, str, dict, int]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        now = time.time()
+        return sum(1 for due, *_ in self._heap if due <= now)
+
+    def _push(self, name: str, payload: dict, due: float, attempts: int = 0):
+        heapq.heappush(self._heap, (due, next(self._sequence), name, payload, attempts))
+        self._wake.set()
+
+    async def enqueue(self, db, name, payload, delay=0):
+        due = time.time() + delay
+        event.listen(db.sync_session, "after_commit", lambda _: self._push(name, payload, due), once=True)
+
+    async def _run(self, name: str, payload: dict, due: float, attempts: int):
+        error = await self._execute(name, payload, due)
+        if error is not None:
+            delay = self._failed(name, attempts + 1, error)
+            if delay is not None:
+                self._push(name, payload, time.time() + delay, attempts + 1)
+
+    async def _dispatch(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now and self._free_slots > 0:
+            due, _, name, payload, attempts = heapq.heappop(self._heap)
+            self._spawn(self._run(name, payload, due, attempts))
+        if not self._heap or self._free_slots == 0:
+            # A new job or a freed slot wakes us
+            return None
+        return self._heap[0][0] - now
+
+    async def stop(self, timeout: float = 30):
+        # Drain: keep running what is due until the heap is empty or time is up
+        deadline = time.monotonic() + timeout
+        while (self.depth or self._running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await super().stop(max(deadline - time.monotonic(), 0))
+        if self._heap:
+            logger.warning("Dropping %d queued jobs at shutdown", len(self._heap))
+
+
+class PostgresJobQueue(JobQueue):
+    """Durable jobs in the jobs table, shared by every worker.
+
+    Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so they
+    never wait on each other or take the same job, and push the claimed
+    jobs' run_at out by a lease instead of holding the row lock while they
+    run: a job whose worker dies becomes due again once its lease expires.
+    Done jobs are deleted, jobs out of attempts are kept as "failed".
+    New jobs wake the workers over the invalidation bus; they also poll.
+    """
+
+    def __init__(self, concurrency: int, max_attempts: int):
+        super().__init__(concurrency, max_attempts)
+        self._depth = 0
+        self._depth_checked = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    async def start(self):
+        invalidation_bus.subscribe("jobs", lambda _: self._wake.set())
+        await super().start()
+
+    async def enqueue(self, db, name, payload, delay=0):
+        now = datetime.now(timezone.utc)
+        await db.execute(
+            insert(JobModel).values(name=name, payload=payload, run_at=now + timedelta(seconds=delay), created_at=now)
+        )
+        await invalidation_bus.publish(db, "jobs", name)
+        # The bus skips our own messages (or delivers them before the commit)
+        event.listen(db.sync_session, "after_commit", lambda _: self._wake.set(), once=True)
+
+    async def _claim(self, limit: int) -> list:
+        now = datetime.now(timezone.utc)
+        async with async_db.get_session() as db:
+            if time.monotonic() - self._depth_checked >= settings.JOBS_POLL_INTERVAL_SECONDS:
+                self._depth = await db.scalar(
+                    select(func.count()).select_from(JobModel)
+                    .where(JobModel.status == "pending", JobModel.run_at <= now)
+                )
+                self._depth_checked = time.monotonic()
+            if limit <= 0:
+                await db.commit()
+                return []
+            result = await db.execute(
+                select(JobModel.id, JobModel.name, JobModel.payload, JobModel.attempts, JobModel.run_at)
+                .where(JobModel.status == "pending", JobModel.run_at <= now)
+                .order_by(JobModel.run_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            jobs = result.all()
+            if jobs:
+                lease = timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+                await db.execute(
+                    update(JobModel)
+                    .where(JobModel.id.in_([job.id for job in jobs]))
+                    .values(run_at=now + lease, attempts=JobModel.attempts + 1)
+                )
+            await db.commit()
+        return jobs
+
+    async def _run(self, job_id: int, name: str, payload: dict, due: datetime, attempts: int):
+        if due.tzinfo is None:
+            due = due.replace(tzinfo=timezone.utc)
+        error = await self._execute(name, payload, due.timestamp())
+        if error is None:
+            stmt = delete(JobModel).where(JobModel.id == job_id)
+        else:
+            delay = self._failed(name, attempts, error)
+            if delay is None:
+                values = {"status": "failed", "last_error": error}
+            else:
+                values = {"run_at": datetime.now(timezone.utc) + timedelta(seconds=delay), "last_error": error}
+            stmt = update(JobModel).where(JobModel.id == job_id).values(**values)
+        # If this fails the lease runs out and the job runs again
+        async with async_db.get_session() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def _dispatch(self):
+        jobs = await self._claim(self._free_slots)
+        for job in jobs:
+            self._spawn(self._run(job.id, job.name, job.payload, job.run_at, job.attempts + 1))
+        return settings.JOBS_POLL_INTERVAL_SECONDS
+
+
+def create_job_queue() -> JobQueue:
+    if settings.JOBS_BACKEND == "postgres":
+        return PostgresJobQueue(settings.JOBS_CONCURRENCY, settings.JOBS_MAX_ATTEMPTS)
+    if settings.JOBS_BACKEND == "memory":
+        return MemoryJobQueue(settings.JOBS_CONCURRENCY, settings.JOBS_MAX_ATTEMPTS)
+    raise ValueError(f"Unknown job queue backend: {settings.JOBS_BACKEND}")
+
+
+# Global instance
+job_queue = create_job_queue()
+metrics.callback("job_queue_depth", "Jobs due and waiting to run", "gauge", lambda: job_queue.depth)
+metrics.callback("jobs_running", "Jobs running on this worker", "gauge", lambda: job_queue.running)
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import smtplib
+from abc import ABC, abstractmethod
+from collections import deque
+from email.message import EmailMessage
+
+from core.metrics import metrics
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+mail_sent = metrics.counter("mail_sent_total", "Emails handed to the mail backend, by outcome")
+
+
+def build_message(to: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+class Mailer(ABC):
+    """Sends emails. Failures raise, so the job sending them is retried."""
+
+    @abstractmethod
+    async def send(self, message: EmailMessage):
+        """Deliver `message`"""
+
+
+class SMTPMailer(Mailer):
+    """Delivers through an SMTP relay, one connection per message on a thread"""
+
+    def _send(self, message: EmailMessage):
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS) as smtp:
+            if settings.SMTP_STARTTLS:
+                smtp.starttls()
+            if settings.SMTP_USERNAME:
+                password = settings.SMTP_PASSWORD.get_secret_value() if settings.SMTP_PASSWORD else ""
+                smtp.login(settings.SMTP_USERNAME, password)
+            smtp.send_message(message)
+
+    async def send(self, message: EmailMessage):
+        try:
+            await asyncio.to_thread(self._send, message)
+        except Exception:
+            mail_sent.inc(outcome="error")
+            raise
+        mail_sent.inc(outcome="sent")
+
+
+class MemoryMailer(Mailer):
+    """Fake SMTP sink for tests and local development: keeps the last
+    messages in `outbox` and logs them instead of sending anything."""
+
+    def __init__(self, max_messages: int = 1000):
+        self.outbox: deque[EmailMessage] = deque(maxlen=max_messages)
+
+    async def send(self, message: EmailMessage):
+        self.outbox.append(message)
+        mail_sent.inc(outcome="captured")
+        logger.info("Captured email to %s: %s", message["To"], message["Subject"])
+
+
+def create_mailer() -> Mailer:
+    if settings.MAIL_BACKEND == "smtp":
+        return SMTPMailer()
+    if settings.MAIL_BACKEND == "memory":
+        return MemoryMailer()
+    raise ValueError(f"Unknown mail backend: {settings.MAIL_BACKEND}")
+
+
+# Global instance
+mailer = create_mailer()
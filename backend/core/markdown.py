@@ -0,0 +1,79 @@
+import hashlib
+import time
+from typing import Optional
+
+from markdown_it import MarkdownIt
+
+from core.cache import TTLCache
+from core.metrics import metrics
+from core.settings import settings
+
+# Bump whenever the rendered output changes (parser options, plugins, link
+# attributes...) so stored HTML gets re-rendered in the background
+RENDERER_VERSION = 1
+
+markdown_render_duration = metrics.histogram(
+    "markdown_render_duration_seconds", "Markdown to HTML render time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+_parser: Optional[MarkdownIt] = None
+
+
+def _link_open(renderer, tokens, idx, options, env):
+    # User content, so outbound links don't pass on ranking or window.opener
+    tokens[idx].attrSet("rel", "nofollow ugc noopener")
+    return renderer.renderToken(tokens, idx, options, env)
+
+
+def _get_parser() -> MarkdownIt:
+    # Built lazily, once per process (pool workers included)
+    global _parser
+    if _parser is None:
+        # Raw HTML is escaped and javascript:/vbscript: links are refused by
+        # the parser, so its output is safe to serve as is
+        _parser = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+        _parser.add_render_rule("link_open", _link_open)
+    return _parser
+
+
+def content_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def render_markdown(source: str) -> str:
+    """Render Markdown to sanitized HTML"""
+    started = time.perf_counter()
+    html = _get_parser().render(source)
+    markdown_render_duration.observe(time.perf_counter() - started)
+    return html
+
+
+def render_many(sources: list[str]) -> list[str]:
+    """Render a batch of documents (runs on a process pool worker)"""
+    parser = _get_parser()
+    return [parser.render(source) for source in sources]
+
+
+# Rendered fragments keyed by the content hash of their source. The HTML for
+# a hash never changes within a renderer version, so entries only leave on LRU
+# eviction or expiry.
+rendered_cache = TTLCache(
+    maxsize=settings.MARKDOWN_CACHE_MAX_SIZE,
+    ttl=settings.MARKDOWN_CACHE_TTL_SECONDS,
+)
+metrics.callback("markdown_cache_hits_total", "Rendered Markdown cache hits", "counter", lambda: rendered_cache.hits)
+metrics.callback(
+    "markdown_cache_misses_total", "Rendered Markdown cache misses", "counter", lambda: rendered_cache.misses
+)
+metrics.callback("markdown_cache_size", "Rendered Markdown fragments cached", "gauge", lambda: len(rendered_cache))
+
+
+def render_cached(source: str) -> tuple[str, str]:
+    """(content hash, HTML) for `source`, rendering only on a cache miss"""
+    digest = content_hash(source)
+    html = rendered_cache.get(digest)
+    if html is None:
+        html = render_markdown(source)
+        rendered_cache.set(digest, html)
+    return digest, html
@@ -0,0 +1,146 @@
+import bisect
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Optional, Union
+
+# Value callbacks return one number, or a {labels: number} mapping
+CallbackValue = Union[float, dict[tuple[tuple[str, str], ...], float]]
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines for this metric's values"""
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str):
+        self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self._buckets = sorted(buckets)
+        # labels -> [per-bucket counts (+ overflow), sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self._buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self._buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip([*self._buckets, math.inf], counts):
+                cumulative += bucket_count
+                bucket_labels = (*labels, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class CallbackMetric(_Metric):
+    """Metric whose value is read from another component when scraped"""
+
+    def __init__(self, name: str, help: str, type: str, fn: Callable[[], CallbackValue]):
+        super().__init__(name, help)
+        self.type = type
+        self._fn = fn
+
+    def samples(self) -> Iterable[str]:
+        value = self._fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, sample in value.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(sample)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Optional[Iterable[float]] = None) -> Histogram:
+        if buckets is None:
+            return self._register(Histogram(name, help))
+        return self._register(Histogram(name, help, buckets))
+
+    def callback(self, name: str, help: str, type: str, fn: Callable[[], CallbackValue]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, type, fn))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = MetricsRegistry()
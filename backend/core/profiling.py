@@ -0,0 +1,279 @@
+import asyncio
+import functools
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+# "<pid>-<uuid hex>" of the worker and request, see RequestProfilingMiddleware
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]+-[0-9a-f]{32}$")
+
+
+class SpanStats:
+    """Call counts and total time per span name"""
+
+    def __init__(self):
+        self.totals: dict[str, list] = {}
+
+    def add(self, name: str, seconds: float):
+        entry = self.totals.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        parts = []
+        for name, (count, seconds) in self.totals.items():
+            part = f"{name};dur={seconds * 1000:.3f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+# Spans of the request being profiled, None otherwise
+_request_spans: ContextVar[Optional[SpanStats]] = ContextVar("request_spans", default=None)
+# Spans of every request while a profiling window is open
+_window_spans: Optional[SpanStats] = None
+
+
+class _Span:
+    __slots__ = ("name", "sinks", "started")
+
+    def __init__(self, name: str, sinks: tuple):
+        self.name = name
+        self.sinks = sinks
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        for sink in self.sinks:
+            sink.add(self.name, elapsed)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Context manager timing a block as `name` when profiling, a shared
+    no-op (one context variable lookup) otherwise"""
+    request_spans = _request_spans.get()
+    if request_spans is None and _window_spans is None:
+        return _NO_SPAN
+    return _Span(name, tuple(sink for sink in (request_spans, _window_spans) if sink is not None))
+
+
+def traced(name: str):
+    """Decorator running an async function in a span"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _request_spans.get() is None and _window_spans is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    # Last two path components are enough to tell modules apart
+    path = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+
+def _fold(frames: list) -> str:
+    """Outermost-first frame names joined the way flamegraph.pl expects"""
+    return ";".join(_frame_name(frame).replace(";", ":") for frame in frames)
+
+
+def _thread_stack(frame) -> list:
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _awaiting_stack(task: asyncio.Task) -> list:
+    """Frames of a suspended task, following what each coroutine awaits"""
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class StackSampler:
+    """Samples Python stacks from a daemon thread every `interval` seconds.
+
+    With a `task`, only that asyncio task is followed and wall-clock time is
+    sampled: its frames on the event loop thread while it runs, and what it
+    is awaiting (database, bcrypt pool, ...) under an "[await]" root while
+    it is suspended. Without one, every other thread is sampled.
+    Results are collapsed stacks ("a;b;c <count>"), as read by
+    flamegraph.pl, speedscope or inferno.
+    """
+
+    def __init__(self, interval: float, task: Optional[asyncio.Task] = None):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._task = task
+        self._loop = task.get_loop() if task is not None else None
+        self._loop_thread = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample_task(self):
+        if self._task.done():
+            return
+        if asyncio.current_task(self._loop) is self._task:
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self.samples[_fold(_thread_stack(frame))] += 1
+        else:
+            self.samples["[await];" + _fold(_awaiting_stack(self._task))] += 1
+
+    def _sample_threads(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own:
+                root = names.get(thread_id, str(thread_id)).replace(";", ":")
+                self.samples[f"{root};{_fold(_thread_stack(frame))}"] += 1
+
+    def _run(self):
+        sample = self._sample_task if self._task is not None else self._sample_threads
+        while not self._stopped.wait(self.interval):
+            try:
+                sample()
+            except Exception:
+                # A frame can vanish while we walk it, skip that sample
+                continue
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+_window_lock = asyncio.Lock()
+
+
+def window_running() -> bool:
+    return _window_lock.locked()
+
+
+async def profile_window(seconds: float, interval: float) -> tuple[str, SpanStats]:
+    """Sample every thread of this worker and time every span for `seconds`"""
+    global _window_spans
+    async with _window_lock:
+        sampler = StackSampler(interval)
+        _window_spans = SpanStats()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            spans, _window_spans = _window_spans, None
+            await asyncio.to_thread(sampler.stop)
+        return sampler.collapsed(), spans
+
+
+def profile_path(profile_id: str) -> Path:
+    return Path(settings.PROFILING_DIR) / f"{profile_id}.folded"
+
+
+def _save_profile(profile_id: str, collapsed: str):
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_path(profile_id).write_text(collapsed)
+    files = sorted(directory.glob("*.folded"), key=lambda path: path.stat().st_mtime)
+    for path in files[:-settings.PROFILING_KEEP_FILES]:
+        path.unlink(missing_ok=True)
+
+
+class RequestProfilingMiddleware:
+    """Profiles requests sent with `X-Profile: <PROFILING_TOKEN>`.
+
+    The response gets a Server-Timing header with the spans timed so far
+    and an X-Profile-Id naming the collapsed-stack file written once the
+    request is done, see GET /admin/profiling/requests/{id}. Without a
+    PROFILING_TOKEN the header is ignored and this costs one check.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        token = settings.PROFILING_TOKEN
+        self._token = token.get_secret_value().encode() if token else None
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self._token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if self._token is None or scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{os.getpid()}-{uuid.uuid4().hex}"
+        spans = SpanStats()
+        sampler = StackSampler(settings.PROFILING_REQUEST_INTERVAL_MS / 1000, asyncio.current_task())
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                if spans.totals:
+                    headers.append((b"server-timing", spans.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_spans.set(spans)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _request_spans.reset(token)
+            await asyncio.to_thread(sampler.stop)
+            try:
+                await asyncio.to_thread(_save_profile, profile_id, sampler.collapsed())
+            except OSError:
+                logger.exception("Saving request profile %s failed", profile_id)
+            logger.info("Profiled %s %s as %s: %s", scope["method"], scope["path"], profile_id, spans.server_timing())
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import case, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from models import RateLimitBucketModel
+
+logger = logging.getLogger(__name__)
+
+rate_limit_rejections = metrics.counter("rate_limit_rejections_total", "Requests refused by a rate limit")
+rate_limit_backend_errors = metrics.counter(
+    "rate_limit_backend_errors_total", "Shared rate limit checks that failed and fell back to the local limit"
+)
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Token bucket: `burst` requests at once, refilled at `per_minute`"""
+    name: str
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60
+
+
+class MemoryRateLimitStore:
+    """Token buckets in this process, split over LRU-bounded shards.
+
+    A check is a dict lookup plus a little arithmetic. Each shard keeps at
+    most max_keys / shards buckets and forgets the least recently used one
+    beyond that; a forgotten bucket simply starts full again.
+    """
+
+    def __init__(self, shards: int, max_keys: int):
+        self._shards: list[OrderedDict[str, list[float]]] = [OrderedDict() for _ in range(shards)]
+        self._max_keys_per_shard = max(max_keys // shards, 1)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """Spend `cost` tokens. 0 when allowed, otherwise seconds until it would be"""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        bucket = shard.get(key)
+        if bucket is None:
+            bucket = shard[key] = [float(limit.burst), now]
+            if len(shard) > self._max_keys_per_shard:
+                shard.popitem(last=False)
+        else:
+            shard.move_to_end(key)
+        tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return 0.0
+        bucket[0] = tokens
+        return (cost - tokens) / limit.rate
+
+
+class PostgresRateLimitStore:
+    """Token buckets shared by every worker, in an UNLOGGED Postgres table.
+
+    One upsert per check refills, spends and reports atomically, so
+    concurrent workers can't both spend the last token. Idle buckets are
+    deleted now and then.
+    """
+
+    def __init__(self, prune_interval: float = 600, idle_after: timedelta = timedelta(hours=1)):
+        self._prune_interval = prune_interval
+        # Longer than any RateLimitBucketModel takes to refill, so a deleted one was full
+        self._idle_after = idle_after
+        self._task: Optional[asyncio.Task] = None
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        # Fixed for the statement (each check is its own transaction), so
+        # every expression below sees the same instant
+        now = func.now()
+        row = RateLimitBucketModel
+        refilled = func.least(
+            literal(float(limit.burst)),
+            row.tokens + func.extract("epoch", now - row.updated_at) * literal(limit.rate),
+        )
+        stmt = pg_insert(row).values(
+            key=key, tokens=float(limit.burst) - cost, allowed=True, updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[row.key],
+            # Every expression here reads the row as it was before the update
+            set_={
+                "tokens": case((refilled >= cost, refilled - cost), else_=refilled),
+                "allowed": refilled >= cost,
+                "updated_at": now,
+            },
+        ).returning(row.tokens, row.allowed)
+        async with async_db.get_session() as db:
+            tokens, allowed = (await db.execute(stmt)).one()
+            await db.commit()
+        return 0.0 if allowed else (cost - tokens) / limit.rate
+
+    async def _prune(self):
+        while True:
+            await asyncio.sleep(self._prune_interval)
+            try:
+                async with async_db.get_session() as db:
+                    await db.execute(
+                        delete(RateLimitBucketModel).where(RateLimitBucketModel.updated_at < func.now() - self._idle_after)
+                    )
+                    await db.commit()
+            except Exception:
+                logger.exception("Pruning idle rate limit buckets failed")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._prune())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class RateLimiter:
+    """Checks limits against this worker's buckets first, then the shared store.
+
+    The local check alone turns a flood away without a single query; only
+    requests it lets through pay for the shared check, which keeps the
+    limit global across workers. If the shared store fails, the local
+    limit still applies.
+    """
+
+    def __init__(self, local: MemoryRateLimitStore, shared: Optional[PostgresRateLimitStore] = None):
+        self.local = local
+        self.shared = shared
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> float:
+        """0 when allowed, otherwise seconds to wait before retrying"""
+        retry_after = self.local.take(key, limit, cost)
+        if not retry_after and self.shared is not None:
+            try:
+                retry_after = await self.shared.take(key, limit, cost)
+            except Exception:
+                rate_limit_backend_errors.inc(limit=limit.name)
+                logger.exception("Shared rate limit check failed, using the local limit only")
+        if retry_after:
+            rate_limit_rejections.inc(limit=limit.name)
+        return retry_after
+
+    async def start(self):
+        if self.shared is not None:
+            await self.shared.start()
+
+    async def stop(self):
+        if self.shared is not None:
+            await self.shared.stop()
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(math.ceil(seconds), 1))
+
+
+def create_rate_limiter() -> RateLimiter:
+    local = MemoryRateLimitStore(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_MAX_KEYS)
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return RateLimiter(local, PostgresRateLimitStore())
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(local)
+    raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+
+
+# Global instance
+rate_limiter = create_rate_limiter()
+metrics.callback("rate_limit_local_buckets", "Token buckets held by this worker", "gauge", lambda: len(rate_limiter.local))
@@ -0,0 +1,200 @@
+import bisect
+import heapq
+import math
+import re
+from typing import Hashable, Iterable, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its of on or "
+    "so that the their then there these they this to was were will with".split()
+)
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """Lowercase word tokens without stopwords"""
+    if not text:
+        return []
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """In-memory full-text index with BM25 ranking and prefix expansion.
+
+    Documents are made of weighted fields (e.g. title 3, body 1); a term's
+    frequency in a document is the weighted sum over its fields. Queries
+    match documents containing every term, and with `prefix` the last term
+    also matches any indexed term it is a prefix of.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, max_prefix_expansions: int = 50):
+        self.max_prefix_expansions = max_prefix_expansions
+        # term -> {doc number: weighted term frequency}
+        self._postings: dict[str, dict[int, float]] = {}
+        self._doc_numbers: dict[Hashable, int] = {}
+        self._doc_keys: dict[int, Hashable] = {}
+        self._doc_terms: dict[int, tuple[str, ...]] = {}
+        self._doc_lengths: dict[int, float] = {}
+        self._total_length = 0.0
+        self._next_number = 0
+        # Sorted vocabulary for prefix lookups. New terms wait in a small set
+        # and get merged in bulk; removed terms are filtered out lazily.
+        self._vocabulary: list[str] = []
+        self._new_terms: set[str] = set()
+        self._removed_terms = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._doc_numbers
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    def add(self, key: Hashable, fields: Iterable[tuple[Optional[str], float]]):
+        """Index (or re-index) document `key` from (text, weight) pairs"""
+        self.remove(key)
+        frequencies: dict[str, float] = {}
+        length = 0.0
+        for text, weight in fields:
+            for token in tokenize(text):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+        number = self._next_number
+        self._next_number += 1
+        self._doc_numbers[key] = number
+        self._doc_keys[number] = key
+        self._doc_terms[number] = tuple(frequencies)
+        self._doc_lengths[number] = length
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._new_terms.add(term)
+            postings[number] = frequency
+
+    def remove(self, key: Hashable):
+        number = self._doc_numbers.pop(key, None)
+        if number is None:
+            return
+        del self._doc_keys[number]
+        self._total_length -= self._doc_lengths.pop(number)
+        for term in self._doc_terms.pop(number):
+            postings = self._postings[term]
+            del postings[number]
+            if not postings:
+                del self._postings[term]
+                if term in self._new_terms:
+                    self._new_terms.discard(term)
+                else:
+                    self._removed_terms += 1
+
+    def clear(self):
+        self.__init__(self.max_prefix_expansions)
+
+    def _sorted_vocabulary(self) -> list[str]:
+        if len(self._new_terms) > 1000 or self._removed_terms > len(self._vocabulary) // 4:
+            self._vocabulary = sorted(self._postings)
+            self._new_terms.clear()
+            self._removed_terms = 0
+        return self._vocabulary
+
+    def _expand(self, prefix: str) -> list[str]:
+        """The most common indexed terms starting with `prefix`"""
+        vocabulary = self._sorted_vocabulary()
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\U0010ffff", start)
+        candidates = [term for term in vocabulary[start:end] if term in self._postings]
+        candidates.extend(term for term in self._new_terms if term.startswith(prefix))
+        if len(candidates) > self.max_prefix_expansions:
+            candidates = heapq.nlargest(
+                self.max_prefix_expansions, candidates, key=lambda term: len(self._postings[term])
+            )
+        return candidates
+
+    def _bm25(self, term_postings: dict[int, float], candidates: Optional[Iterable[int]] = None) -> dict[int, float]:
+        """BM25 score of one term for `candidates` (all its documents when None)"""
+        documents = len(self._doc_numbers)
+        average_length = (self._total_length / documents if documents else 1.0) or 1.0
+        idf = math.log(1 + (documents - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+        # idf * f * (k1 + 1) / (f + k1 * (1 - b + b * length / average)), constants hoisted
+        scale = idf * (self.K1 + 1)
+        base = self.K1 * (1 - self.B)
+        per_length = self.K1 * self.B / average_length
+        lengths = self._doc_lengths
+        if candidates is None:
+            return {
+                number: scale * frequency / (frequency + base + per_length * lengths[number])
+                for number, frequency in term_postings.items()
+            }
+        return {
+            number: scale * frequency / (frequency + base + per_length * lengths[number])
+            for number in candidates
+            if (frequency := term_postings.get(number)) is not None
+        }
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        after: Optional[tuple[float, Hashable]] = None,
+        prefix: bool = False,
+    ) -> list[tuple[float, Hashable]]:
+        """Return up to `limit` (score, key) pairs, best first.
+
+        `after` is the last (score, key) of the previous page; ties on score
+        are broken by key, descending, so pages never overlap.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        groups: list[list[dict[int, float]]] = []
+        for index, term in enumerate(terms):
+            if prefix and index == len(terms) - 1:
+                expansions = self._expand(term)
+            else:
+                expansions = [term] if term in self._postings else []
+            if not expansions:
+                return []
+            groups.append([self._postings[expansion] for expansion in expansions])
+
+        # Start from the rarest term so the other lookups only touch its documents
+        groups.sort(key=lambda group: sum(len(postings) for postings in group))
+        scores: Optional[dict[int, float]] = None
+        for group in groups:
+            candidates = None if scores is None else scores.keys()
+            if len(group) == 1:
+                group_scores = self._bm25(group[0], candidates)
+            else:
+                # A prefix matches through its best-scoring expansion
+                group_scores = {}
+                for postings in group:
+                    for number, score in self._bm25(postings, candidates).items():
+                        if score > group_scores.get(number, 0.0):
+                            group_scores[number] = score
+            if scores is not None:
+                group_scores = {number: score + scores[number] for number, score in group_scores.items()}
+            scores = group_scores
+            if not scores:
+                return []
+
+        keys = self._doc_keys
+        if after is not None:
+            after_score, after_key = after
+            scores = {
+                number: score for number, score in scores.items()
+                if score < after_score or (score == after_score and keys[number] < after_key)
+            }
+        if len(scores) > limit:
+            # Cut down on plain floats first, ties at the cut-off survive
+            threshold = heapq.nlargest(limit, scores.values())[-1]
+            scores = {number: score for number, score in scores.items() if score >= threshold}
+        results = sorted(((score, keys[number]) for number, score in scores.items()), reverse=True)
+        return results[:limit]
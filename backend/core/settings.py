@@ -1,7 +1,7 @@
 import os
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from pydantic import PostgresDsn, SecretStr, field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -11,6 +11,30 @@ class Settings(BaseSettings):
     POSTGRES_HOST: Optional[str] = None
     POSTGRES_PORT: Optional[int] = None
     POSTGRES_DB: Optional[str] = None
+    DATABASE_URL: Optional[str] = None  # Overrides the POSTGRES_* settings, e.g. for benchmarks
+
+    # Connection pool configuration (primary)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1  # Seconds before a connection is replaced, -1 to disable
+    DB_POOL_PRE_PING: bool = False
+    DB_WARMUP_CONNECTIONS: int = 5  # Connections per engine opened and primed at startup, 0 to skip
+
+    # Database instrumentation
+    DB_ECHO: bool = False  # Log every statement, slow: development only
+    DB_SLOW_QUERY_MS: float = 200
+    DB_SLOW_QUERY_SAMPLE_RATE: float = 1.0  # Fraction of slow queries that get logged
+    DB_REQUEST_QUERY_WARN: int = 25  # Log requests running at least this many statements
+    DB_CONNECTION_HOLD_WARN_MS: float = 500  # Log connections held longer than this by a request
+
+    # Read replicas: comma separated postgresql+asyncpg:// DSNs
+    DB_REPLICA_URLS: Annotated[List[str], NoDecode] = []
+    DB_REPLICA_POOL_SIZE: int = 20
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    DB_REPLICA_STRATEGY: str = "least_connections"  # Or "round_robin"
+    DB_REPLICA_RETRY_SECONDS: float = 30  # How long a failed replica is skipped
+    DB_REPLICA_STICKY_SECONDS: float = 5  # Read a user from the primary this long after writing it
 
     # App configuration
     DOMAIN: Optional[str] = None
@@ -23,9 +47,120 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"  # Or "RS256" for asymmetric encryption
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Password hashing pool configuration
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64  # Pending hashes beyond the workers before returning 503
+    USER_IMPORT_HASH_WORKERS: int = 1  # Threads hashing an HTTP import's passwords, apart from the login pool
+
+    # Authenticated user cache configuration
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60
+
+    # Cross-worker cache invalidation
+    INVALIDATION_BUS_BACKEND: str = "postgres"  # "postgres" or "local" (single worker / tests)
+    INVALIDATION_BUS_CHANNEL: str = "cache_invalidation"
+
+    # Background work (timeline fan-out, cleanups)
+    BACKGROUND_WORKERS: int = 4
+    BACKGROUND_QUEUE_SIZE: int = 1000  # Queued jobs before submitters have to wait
+
+    # Durable job queue (verification emails, notifications)
+    JOBS_BACKEND: str = "postgres"  # "postgres" (jobs table, shared by every worker) or "memory" (tests / single worker)
+    JOBS_CONCURRENCY: int = 8  # Jobs running at once per worker
+    JOBS_POLL_INTERVAL_SECONDS: float = 2  # New jobs wake the workers, polling catches retries and missed wake-ups
+    JOBS_TIMEOUT_SECONDS: float = 60  # A job running longer counts as failed
+    JOBS_LEASE_SECONDS: float = 300  # A claimed job runs again after this if its worker died, keep it > JOBS_TIMEOUT_SECONDS
+    JOBS_MAX_ATTEMPTS: int = 8
+    JOBS_RETRY_BASE_SECONDS: float = 10  # Backoff after the first failure, doubled after each one
+    JOBS_RETRY_MAX_SECONDS: float = 3600
+    JOBS_DRAIN_TIMEOUT_SECONDS: float = 30  # Time running jobs get to finish at shutdown
+
+    # Outgoing mail
+    MAIL_BACKEND: str = "smtp"  # "smtp" or "memory" (fake sink keeping the messages in process, for tests)
+    MAIL_FROM: str = "no-reply@localhost"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 25
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[SecretStr] = None
+    SMTP_STARTTLS: bool = False
+    SMTP_TIMEOUT_SECONDS: float = 10
+    EMAIL_VERIFICATION_URL: str = "http://localhost:3000/verify-email?token={token}"
+    EMAIL_VERIFICATION_EXPIRE_HOURS: int = 48
+
+    # Following timelines
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 10000  # Bigger authors are merged in at read time instead
+    TIMELINE_FANOUT_BATCH_SIZE: int = 1000  # Follower timelines written per transaction
+    TIMELINE_BACKFILL_ARTICLES: int = 20  # Recent articles copied into a timeline on follow
+
+    # Article search
+    SEARCH_BACKEND: str = "postgres"  # "postgres" or "memory" (tests / small deployments)
+    SEARCH_LANGUAGE: str = "english"  # Postgres text search configuration
+    SEARCH_PREFIX_EXPANSIONS: int = 50  # Terms a search-as-you-type prefix may expand to (memory backend)
+
+    # Buffered article view / clap counters
+    COUNTER_FLUSH_INTERVAL_SECONDS: float = 5
+    COUNTER_FLUSH_BATCH_SIZE: int = 1000  # Rows per UPDATE ... FROM (VALUES ...) statement
+    COUNTER_BUFFER_MAX_KEYS: int = 50000  # Articles buffered per worker before increments are dropped
+
+    # Tag pages and trending tags, served from per-worker memory
+    TAGS_REFRESH_SECONDS: float = 60  # How stale tag counts and trending may get
+    TAGS_CACHE_SIZE: int = 1000  # Most used tags kept in memory, rarer ones are looked up by key
+    TAGS_TRENDING_WINDOW_HOURS: int = 72  # Publishes older than this don't count towards trending
+    TAGS_TRENDING_HALF_LIFE_HOURS: float = 12  # A publish counts half as much this much later
+    TAGS_TRENDING_SIZE: int = 50
+
+    # Markdown rendering
+    MARKDOWN_CACHE_MAX_SIZE: int = 2000  # Rendered article bodies kept per worker
+    MARKDOWN_CACHE_TTL_SECONDS: float = 3600
+    MARKDOWN_RERENDER_ON_STARTUP: bool = True  # Re-render bodies left by an older renderer version
+    MARKDOWN_RERENDER_WORKERS: int = 2  # Processes used by the background re-render
+    MARKDOWN_RERENDER_BATCH_SIZE: int = 200  # Articles re-rendered per transaction
+
+    # Opt-in: serialize list / export responses without FastAPI's validate-then-encode pass
+    FAST_SERIALIZATION: bool = False
+
+    # Media uploads
+    MEDIA_ROOT: str = "media"  # Local directory holding the content-addressed files
+    MEDIA_MAX_BYTES: int = 20 * 1024 * 1024
+    MEDIA_CACHE_MAX_AGE_SECONDS: int = 365 * 24 * 3600  # Files never change, so cache them "forever"
+    MEDIA_ACCEL_REDIRECT_PREFIX: Optional[str] = None  # nginx internal location serving MEDIA_ROOT, e.g. "/_media"
+
+    # Rate limiting (token buckets)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "postgres" (shared by every worker)
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Buckets kept per worker, least recently used ones are forgotten
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # Behind a proxy: client IP is the last X-Forwarded-For hop
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 30
+    LOGIN_RATE_LIMIT_IP_BURST: int = 10
+    LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE: float = 10  # Per username and IP, so others can't lock an account out
+    LOGIN_RATE_LIMIT_USERNAME_BURST: int = 5
+    LOGIN_RATE_LIMIT_USERNAME_GLOBAL_PER_MINUTE: float = 30  # Per username from anywhere, caps distributed guessing
+    LOGIN_RATE_LIMIT_USERNAME_GLOBAL_BURST: int = 20
+    LOGIN_MAX_IN_FLIGHT_PER_IP: int = 1  # Logins from one address being verified at once, per worker (needs client IPs behind a proxy)
+    AVAILABILITY_RATE_LIMIT_PER_MINUTE: float = 120  # Per IP, a signup form checks on every keystroke
+    AVAILABILITY_RATE_LIMIT_BURST: int = 30
+
+    # Username / email availability checks (per-worker Bloom filter)
+    USER_AVAILABILITY_CAPACITY: int = 1_000_000  # Names (usernames + emails) the filter is sized for, grows with the users table
+    USER_AVAILABILITY_FALSE_POSITIVE_RATE: float = 0.01  # Free names that still cost a query, ~9.6 bits per name at 1%
+    USER_AVAILABILITY_NEGATIVE_CACHE_SIZE: int = 10000  # Names a query found free, kept per worker
+    USER_AVAILABILITY_NEGATIVE_CACHE_TTL_SECONDS: float = 300
+
+    # On-demand profiling of live workers
+    PROFILING_ENABLED: bool = True  # Super admin profiling endpoints and the serialization span
+    PROFILING_TOKEN: Optional[SecretStr] = None  # Requests sent with "X-Profile: <token>" get profiled, unset to ignore the header
+    PROFILING_DIR: str = "profiles"  # Collapsed stacks of profiled requests, shared by the workers of a host
+    PROFILING_KEEP_FILES: int = 200
+    PROFILING_REQUEST_INTERVAL_MS: float = 1  # Sampling interval for a single request
+    PROFILING_MAX_WINDOW_SECONDS: float = 60
+
     # Computed database URLs
     @property
-    def async_db_url(self) -> PostgresDsn:
+    def async_db_url(self) -> PostgresDsn | str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return self._build_db_url("postgresql+asyncpg")
 
     @property
@@ -42,6 +177,13 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @field_validator("DB_REPLICA_URLS", mode="before")
+    @classmethod
+    def parse_replica_urls(cls, v: str | List[str]) -> List[str]:
+        if isinstance(v, str):
+            return [url.strip() for url in v.split(",") if url.strip()]
+        return v
+
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     @classmethod
     def parse_cors_origins(cls, v: str | List[str]) -> List[str]:
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterable, Optional
+
+from starlette.responses import FileResponse, Response
+from starlette.types import Send
+
+from core.metrics import metrics
+from core.settings import settings
+
+media_upload_bytes = metrics.counter("media_upload_bytes_total", "Bytes received by media uploads")
+media_uploads = metrics.counter("media_uploads_total", "Media uploads, by outcome")
+
+# Accepted media, recognised by their leading bytes rather than the client's
+# Content-Type or file name. Only types browsers render inertly are allowed.
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+}
+MEDIA_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.(" + "|".join(MEDIA_TYPES) + r")$")
+
+# ISO-BMFF major brands of MP4 video. HEIC / AVIF images, QuickTime and
+# 3GP share the "ftyp" box but not these.
+_MP4_BRANDS = {b"isom", b"iso2", b"mp41", b"mp42", b"avc1", b"M4V "}
+
+# Disk writes are batched to this size, which also bounds per-upload memory
+_WRITE_BUFFER_SIZE = 1 << 20
+
+
+class MediaError(Exception):
+    """Upload rejected; `detail` is safe to show the client"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class MediaTooLargeError(MediaError):
+    pass
+
+
+class UnsupportedMediaError(MediaError):
+    pass
+
+
+@dataclass
+class StoredMedia:
+    id: str  # "<sha256 hex>.<extension>"
+    content_type: str
+    size: int
+    created: bool  # False when identical content was already stored
+
+
+def sniff_extension(head: bytes) -> Optional[str]:
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _MP4_BRANDS:
+        return "mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    return None
+
+
+class LocalMediaStorage:
+    """Content-addressed media files on a local filesystem.
+
+    A file is stored once under `root/ab/cd/<sha256>.<ext>`, whatever name
+    and however many times it is uploaded. Files are written to `root/tmp`
+    first and renamed into place, so a reader never sees a partial file.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self._max_bytes = max_bytes
+
+    def path_for(self, media_id: str) -> Path:
+        return self.root / media_id[:2] / media_id[2:4] / media_id
+
+    async def save(self, chunks: AsyncIterable[bytes]) -> StoredMedia:
+        """Stream `chunks` to disk, hashing them on the way"""
+        tmp_dir = self.root / "tmp"
+        await asyncio.to_thread(tmp_dir.mkdir, parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        buffer = bytearray()
+        try:
+            with os.fdopen(fd, "wb") as output:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self._max_bytes:
+                        raise MediaTooLargeError(f"Media larger than {self._max_bytes} bytes")
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    digest.update(chunk)
+                    buffer += chunk
+                    if len(buffer) >= _WRITE_BUFFER_SIZE:
+                        await asyncio.to_thread(output.write, buffer)
+                        buffer = bytearray()
+                if buffer:
+                    await asyncio.to_thread(output.write, buffer)
+            extension = sniff_extension(head)
+            if extension is None:
+                raise UnsupportedMediaError(f"Unsupported media type, expected one of: {', '.join(MEDIA_TYPES)}")
+            media_id = f"{digest.hexdigest()}.{extension}"
+            created = await asyncio.to_thread(self._commit, tmp_path, self.path_for(media_id))
+        except MediaError:
+            media_uploads.inc(outcome="rejected")
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        media_uploads.inc(outcome="stored" if created else "deduplicated")
+        media_upload_bytes.inc(size)
+        return StoredMedia(id=media_id, content_type=MEDIA_TYPES[extension], size=size, created=created)
+
+    @staticmethod
+    def _commit(tmp_path: str, path: Path) -> bool:
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        # Atomic, and concurrent uploads of the same content write identical bytes
+        os.replace(tmp_path, path)
+        return True
+
+    def response(self, media_id: str, headers: dict) -> Response:
+        """Response serving a stored file (Range requests included)"""
+        path = self.path_for(media_id)
+        content_type = MEDIA_TYPES[media_id.rsplit(".", 1)[1]]
+        if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+            # Let the fronting nginx sendfile() it (and answer Range itself)
+            internal = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{path.relative_to(self.root)}"
+            return Response(media_type=content_type, headers={**headers, "X-Accel-Redirect": internal})
+        return MediaFileResponse(path, media_type=content_type, headers=headers)
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse that hands the file to the ASGI server when it supports
+    the zero-copy or pathsend extensions, instead of copying it through
+    Python in 64 KiB reads. Servers without them get the regular path.
+    """
+
+    async def __call__(self, scope, receive, send):
+        self._extensions = scope.get("extensions") or {}
+        await super().__call__(scope, receive, send)
+
+    async def _send_zerocopy(self, send: Send, start: int, count: int):
+        with open(self.path, "rb") as file:
+            await send({
+                "type": "http.response.zerocopy",
+                "file": file,
+                "offset": start,
+                "count": count,
+                "more_body": False,
+            })
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        if "http.response.zerocopy" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await self._send_zerocopy(send, 0, int(self.headers["content-length"]))
+        elif "http.response.pathsend" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.pathsend", "path": str(Path(self.path).resolve())})
+        else:
+            await super()._handle_simple(send, send_header_only)
+
+    async def _handle_single_range(
+        self, send: Send, start: int, end: int, file_size: int, send_header_only: bool
+    ) -> None:
+        if send_header_only or "http.response.zerocopy" not in self._extensions:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._send_zerocopy(send, start, end - start)
+
+
+# Global instance
+media_storage = LocalMediaStorage(settings.MEDIA_ROOT, max_bytes=settings.MEDIA_MAX_BYTES)
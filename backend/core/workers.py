@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from core.metrics import metrics
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+background_jobs = metrics.counter("background_jobs_total", "Background jobs run, by outcome")
+background_job_duration = metrics.histogram("background_job_duration_seconds", "Background job run time")
+background_job_wait = metrics.histogram("background_job_wait_seconds", "Time jobs spent queued")
+
+Job = Callable[..., Awaitable[Any]]
+
+
+class BackgroundWorker:
+    """Runs coroutine jobs on a fixed number of tasks fed by a bounded queue.
+
+    When the queue is full `submit` waits for room, so a burst of work slows
+    its producers down instead of growing memory without limit.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self._workers = workers
+        self._max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"{self.name}-worker-{index}")
+            for index in range(self._workers)
+        ]
+
+    async def submit(self, job: Job, *args: Any):
+        """Queue `job(*args)`, or run it right away when the worker isn't started"""
+        if not self._tasks:
+            await self._execute(job, args, time.perf_counter())
+            return
+        await self._queue.put((job, args, time.perf_counter()))
+
+    async def _execute(self, job: Job, args: tuple, queued_at: float):
+        started = time.perf_counter()
+        background_job_wait.observe(started - queued_at, worker=self.name)
+        try:
+            await job(*args)
+        except Exception:
+            background_jobs.inc(worker=self.name, job=job.__name__, outcome="error")
+            logger.exception("Background job %s failed", job.__name__)
+        else:
+            background_jobs.inc(worker=self.name, job=job.__name__, outcome="ok")
+        finally:
+            background_job_duration.observe(time.perf_counter() - started, worker=self.name)
+
+    async def _run(self):
+        while True:
+            job, args, queued_at = await self._queue.get()
+            try:
+                await self._execute(job, args, queued_at)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 30):
+        """Finish the queued jobs (for up to `timeout` seconds), then stop"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d queued %s jobs at shutdown", self._queue.qsize(), self.name)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+# Global instance
+background_worker = BackgroundWorker(
+    "background",
+    workers=settings.BACKGROUND_WORKERS,
+    max_queue=settings.BACKGROUND_QUEUE_SIZE,
+)
+metrics.callback(
+    "background_queue_depth", "Jobs waiting for a background worker", "gauge",
+    lambda: background_worker.pending,
+)
@@ -1,16 +1,79 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from core.settings import settings
+from core.bus import invalidation_bus
+from core.cache import invalidate_user
 from core.db import async_db
+from core.instrumentation import RequestMetricsMiddleware
+from core.jobs import job_queue
+from core.metrics import metrics
+from core.profiling import RequestProfilingMiddleware
+from core.ratelimit import rate_limiter
+from core.workers import background_worker
 from api.routers import api_router
+import api.emails  # noqa: F401  Registers the email job handlers
+from api.security import password_hasher
+from api.serialization import trace_response_model_serialization
+from ops import user_ops
+from ops.article_ops import article_counters
+from ops.article_render import schedule_rerender
+from ops.article_search import search_backend
+from ops.user_availability import user_availability
+from ops.tag_ops import tag_stats
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(app: FastAPI):
+    """Prime the connection pools, then report ready"""
+    delay = 1
+    while settings.DB_WARMUP_CONNECTIONS > 0:
+        try:
+            await async_db.warm_up(settings.DB_WARMUP_CONNECTIONS, user_ops.warm_up)
+            break
+        except Exception:
+            logger.exception("Primary database warm-up failed, retrying in %ss", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+    app.state.ready = True
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code
     await async_db.init()
+    await password_hasher.start()
+    invalidation_bus.subscribe("users", invalidate_user)
+    await invalidation_bus.start()
+    await background_worker.start()
+    await search_backend.start()
+    await user_availability.start()
+    await job_queue.start()
+    await article_counters.start()
+    await rate_limiter.start()
+    await tag_stats.start()
+    if settings.MARKDOWN_RERENDER_ON_STARTUP:
+        await schedule_rerender()
+    # Warm up in the background so liveness answers while readiness waits
+    app.state.ready = False
+    warm_up_task = asyncio.create_task(warm_up(app))
     yield
     # Shutdown code
+    warm_up_task.cancel()
+    # Write out buffered counters while the database is still available
+    await article_counters.stop()
+    await rate_limiter.stop()
+    # Let running jobs finish (durable ones left queued run after the restart)
+    await job_queue.stop(settings.JOBS_DRAIN_TIMEOUT_SECONDS)
+    await background_worker.stop()
+    await search_backend.stop()
+    await user_availability.stop()
+    await tag_stats.stop()
+    await invalidation_bus.stop()
     await async_db.close()
+    password_hasher.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,9 +84,31 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+# Outermost, so a profiled request's samples and spans cover all of it
+app.add_middleware(RequestProfilingMiddleware)
+if settings.PROFILING_ENABLED:
+    trace_response_model_serialization()
+
 # Include all routers
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
+# Prometheus scrape target, keep it off the public ingress
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/live", include_in_schema=False)
+def read_liveness():
+    return {"status": "alive"}
+
+# Load balancers should only route to workers that report ready
+@app.get("/health/ready", include_in_schema=False)
+def read_readiness(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready"}
+
 @app.get("/")
 def read_root():
     return {"message": "Hello World"}
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""articles and tags
+
+Revision ID: 3b8f5d21c7e4
+Revises: 7c1d2e9a4b60
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8f5d21c7e4'
+down_revision: Union[str, None] = '7c1d2e9a4b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('articles',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('author_id', sa.UUID(), nullable=False),
+    sa.Column('slug', sa.String(length=120), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('summary', sa.String(length=500), nullable=True),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PUBLISHED', name='articlestatusenum'), nullable=False),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    op.create_index('ix_articles_published_feed', 'articles', ['published_at', 'id'], unique=False,
+                    postgresql_where=sa.text("status = 'PUBLISHED'"),
+                    postgresql_include=['author_id', 'slug', 'title', 'summary'])
+    op.create_index('ix_articles_author_published_feed', 'articles', ['author_id', 'published_at', 'id'], unique=False,
+                    postgresql_where=sa.text("status = 'PUBLISHED'"),
+                    postgresql_include=['slug', 'title', 'summary'])
+    op.create_table('article_tags',
+    sa.Column('article_id', sa.UUID(), nullable=False),
+    sa.Column('tag', sa.String(length=50), nullable=False),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('article_id', 'tag')
+    )
+    op.create_index('ix_article_tags_feed', 'article_tags', ['tag', 'published_at', 'article_id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_article_tags_feed', table_name='article_tags')
+    op.drop_table('article_tags')
+    op.drop_index('ix_articles_author_published_feed', table_name='articles')
+    op.drop_index('ix_articles_published_feed', table_name='articles')
+    op.drop_table('articles')
+    sa.Enum(name='articlestatusenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,44 @@
+"""article search vector
+
+Revision ID: 5d2c8b0e6f13
+Revises: 9e4a7c3f1d25
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c8b0e6f13'
+down_revision: Union[str, None] = '9e4a7c3f1d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Same document as PostgresSearchBackend, with the default 'english' configuration
+    op.execute("""
+        UPDATE articles SET search_vector =
+            setweight(to_tsvector('english', articles.title), 'A') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT concat_ws(' ', users.username, users.full_name) FROM users WHERE users.id = articles.author_id),
+                '')), 'B') ||
+            setweight(to_tsvector('english', articles.body), 'C')
+    """)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_articles_search_vector', 'articles', ['search_vector'], unique=False,
+                        postgresql_using='gin', postgresql_where=sa.text("status = 'PUBLISHED'"),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_articles_search_vector', table_name='articles', postgresql_concurrently=True)
+    op.drop_column('articles', 'search_vector')
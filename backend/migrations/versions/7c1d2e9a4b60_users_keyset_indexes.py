@@ -0,0 +1,40 @@
+"""users keyset pagination indexes
+
+Revision ID: 7c1d2e9a4b60
+Revises: 0419a144c8f2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d2e9a4b60'
+down_revision: Union[str, None] = '0419a144c8f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination on (created_at, id) is only correct without NULLs
+    op.execute("UPDATE users SET created_at = now() WHERE created_at IS NULL")
+    op.alter_column('users', 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+    # Build the indexes without blocking writes on large tables
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_users_role_created_at_id', 'users', ['role', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_users_is_verified_created_at_id', 'users', ['is_verified', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_is_verified_created_at_id', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_role_created_at_id', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_created_at_id', table_name='users', postgresql_concurrently=True)
+    op.alter_column('users', 'created_at', existing_type=sa.DateTime(), nullable=True)
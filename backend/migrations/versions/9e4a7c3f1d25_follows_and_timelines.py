@@ -0,0 +1,53 @@
+"""follows and timelines
+
+Revision ID: 9e4a7c3f1d25
+Revises: 3b8f5d21c7e4
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a7c3f1d25'
+down_revision: Union[str, None] = '3b8f5d21c7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_users_follower_count', 'users', ['follower_count'], unique=False)
+    op.create_table('follows',
+    sa.Column('follower_id', sa.UUID(), nullable=False),
+    sa.Column('followee_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['followee_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+    )
+    op.create_index('ix_follows_followee_follower', 'follows', ['followee_id', 'follower_id'], unique=False)
+    op.create_table('timeline_entries',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('published_at', sa.DateTime(), nullable=False),
+    sa.Column('article_id', sa.UUID(), nullable=False),
+    sa.Column('author_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'published_at', 'article_id')
+    )
+    op.create_index('ix_timeline_entries_article_id', 'timeline_entries', ['article_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_timeline_entries_article_id', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
+    op.drop_index('ix_follows_followee_follower', table_name='follows')
+    op.drop_table('follows')
+    op.drop_index('ix_users_follower_count', table_name='users')
+    op.drop_column('users', 'follower_count')
@@ -0,0 +1,30 @@
+"""article counters
+
+Revision ID: a4f1e6b2c9d7
+Revises: 5d2c8b0e6f13
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f1e6b2c9d7'
+down_revision: Union[str, None] = '5d2c8b0e6f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('views', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('articles', sa.Column('claps', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'claps')
+    op.drop_column('articles', 'views')
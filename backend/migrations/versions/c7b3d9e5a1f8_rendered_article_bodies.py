@@ -0,0 +1,34 @@
+"""rendered article bodies
+
+Revision ID: c7b3d9e5a1f8
+Revises: a4f1e6b2c9d7
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7b3d9e5a1f8'
+down_revision: Union[str, None] = 'a4f1e6b2c9d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('body_html', sa.Text(), nullable=True))
+    op.add_column('articles', sa.Column('body_hash', sa.String(length=64), nullable=True))
+    # Existing rows start at version 0 and are rendered by the app's
+    # background re-render (MARKDOWN_RERENDER_ON_STARTUP)
+    op.add_column('articles', sa.Column('renderer_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'renderer_version')
+    op.drop_column('articles', 'body_hash')
+    op.drop_column('articles', 'body_html')
@@ -0,0 +1,51 @@
+"""tags
+
+Revision ID: d3e9b5f1a7c4
+Revises: b8d4f0a2c6e1
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3e9b5f1a7c4'
+down_revision: Union[str, None] = 'b8d4f0a2c6e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tags',
+    sa.Column('tag', sa.String(length=50), nullable=False),
+    sa.Column('article_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('tag')
+    )
+    op.create_table('tag_activity',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('tag', sa.String(length=50), nullable=False),
+    sa.Column('published', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'tag')
+    )
+    # Backfill from the published tag rows, once; writers keep both up to date from here
+    op.execute(
+        "INSERT INTO tags (tag, article_count) "
+        "SELECT tag, count(*) FROM article_tags WHERE published_at IS NOT NULL GROUP BY tag"
+    )
+    # The last 72 hours, the default TAGS_TRENDING_WINDOW_HOURS
+    op.execute(
+        "INSERT INTO tag_activity (hour, tag, published) "
+        "SELECT date_trunc('hour', published_at), tag, count(*) FROM article_tags "
+        "WHERE published_at >= date_trunc('hour', now() AT TIME ZONE 'UTC') - interval '71 hours' "
+        "GROUP BY 1, 2"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tag_activity')
+    op.drop_table('tags')
@@ -0,0 +1,43 @@
+"""media
+
+Revision ID: e2a8f4c6b0d3
+Revises: c7b3d9e5a1f8
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a8f4c6b0d3'
+down_revision: Union[str, None] = 'c7b3d9e5a1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media',
+    sa.Column('id', sa.String(length=80), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('uploader_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['uploader_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('articles', sa.Column('cover_media_id', sa.String(length=80), nullable=True))
+    op.create_foreign_key(
+        'articles_cover_media_id_fkey', 'articles', 'media', ['cover_media_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('articles_cover_media_id_fkey', 'articles', type_='foreignkey')
+    op.drop_column('articles', 'cover_media_id')
+    op.drop_table('media')
@@ -1 +1,7 @@
-from .users import UserModel
\ No newline at end of file
+from .users import UserModel
+from .articles import ArticleModel, ArticleTagModel
+from .follows import FollowModel, TimelineEntryModel
+from .media import MediaModel
+from .ratelimits import RateLimitBucketModel
+from .jobs import JobModel
+from .tags import TagModel, TagActivityModel
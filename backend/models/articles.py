@@ -0,0 +1,80 @@
+from sqlalchemy import UUID, BigInteger, Column, DateTime, Enum, ForeignKey, Index, Integer, String, Text, func, literal, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from .base import CommonBase
+from enum import Enum as PyEnum
+
+class ArticleStatusEnum(str, PyEnum):
+  DRAFT = "draft"
+  PUBLISHED = "published"
+
+# Columns served by feed pages, kept in the feed indexes so a page never
+# touches the heap for them (and never loads the body)
+FEED_COLUMNS = ["author_id", "slug", "title", "summary"]
+
+class ArticleModel(CommonBase):
+  __tablename__ = "articles"
+  __table_args__ = (
+    # Global feed, newest published first
+    Index(
+      "ix_articles_published_feed", "published_at", "id",
+      postgresql_where=text("status = 'PUBLISHED'"),
+      postgresql_include=FEED_COLUMNS,
+    ),
+    # Per-author feed
+    Index(
+      "ix_articles_author_published_feed", "author_id", "published_at", "id",
+      postgresql_where=text("status = 'PUBLISHED'"),
+      postgresql_include=["slug", "title", "summary"],
+    ),
+    # Full-text search over published articles
+    Index(
+      "ix_articles_search_vector", "search_vector",
+      postgresql_using="gin",
+      postgresql_where=text("status = 'PUBLISHED'"),
+    ),
+  )
+  id = Column(UUID, primary_key=True)
+  author_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+  slug = Column(String(120), unique=True, nullable=False)
+  title = Column(String(200), nullable=False)
+  summary = Column(String(500), nullable=True)
+  cover_media_id = Column(String(80), ForeignKey("media.id", ondelete="SET NULL"), nullable=True)
+  body = Column(Text, nullable=False)
+  # Sanitized HTML rendered from the Markdown body at write time, with the
+  # hash of the source it came from and the renderer version that produced
+  # it. Deferred, the read path serves it from core.markdown.rendered_cache.
+  body_html = deferred(Column(Text, nullable=True))
+  body_hash = Column(String(64), nullable=True)
+  renderer_version = Column(Integer, default=0, server_default="0", nullable=False)
+  status = Column(Enum(ArticleStatusEnum), default=ArticleStatusEnum.DRAFT, nullable=False)
+  published_at = Column(DateTime, nullable=True)
+  created_at = Column(DateTime, server_default=func.now(), nullable=False)
+  updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+  # Written behind in batches by ops.article_ops.article_counters
+  views = Column(BigInteger, default=0, server_default="0", nullable=False)
+  claps = Column(BigInteger, default=0, server_default="0", nullable=False)
+  # Weighted title (A), author names (B) and body (C), maintained by the
+  # postgres search backend. Deferred so article loads never carry it.
+  search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
+
+# Filter for published articles. The status is rendered inline rather than
+# bound, because generic prepared plans only use the partial indexes when the
+# predicate matches theirs literally.
+IS_PUBLISHED = ArticleModel.status == literal(
+  ArticleStatusEnum.PUBLISHED, ArticleModel.status.type, literal_execute=True
+)
+
+class ArticleTagModel(CommonBase):
+  __tablename__ = "article_tags"
+  __table_args__ = (
+    # Per-tag feed. published_at is copied from the article (NULL while it
+    # isn't published) so a tag page is a single range scan.
+    Index(
+      "ix_article_tags_feed", "tag", "published_at", "article_id",
+      postgresql_where=text("published_at IS NOT NULL"),
+    ),
+  )
+  article_id = Column(UUID, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True)
+  tag = Column(String(50), primary_key=True)
+  published_at = Column(DateTime, nullable=True)
@@ -0,0 +1,25 @@
+from sqlalchemy import UUID, Column, DateTime, ForeignKey, Index, func
+from .base import CommonBase
+
+class FollowModel(CommonBase):
+  __tablename__ = "follows"
+  __table_args__ = (
+    # Fan-out walks an author's followers
+    Index("ix_follows_followee_follower", "followee_id", "follower_id"),
+  )
+  follower_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+  followee_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+  created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+class TimelineEntryModel(CommonBase):
+  __tablename__ = "timeline_entries"
+  __table_args__ = (
+    # Unpublishing retracts an article from every timeline
+    Index("ix_timeline_entries_article_id", "article_id"),
+  )
+  # The primary key doubles as the feed index: one user's timeline, newest
+  # first, is a single range scan
+  user_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+  published_at = Column(DateTime, primary_key=True)
+  article_id = Column(UUID, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True)
+  author_id = Column(UUID, nullable=False)
@@ -0,0 +1,20 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String, Text, text
+from .base import CommonBase
+
+class JobModel(CommonBase):
+  __tablename__ = "jobs"
+  __table_args__ = (
+    # Due jobs, oldest first, see core.jobs.PostgresJobQueue
+    Index("ix_jobs_pending_run_at", "run_at", postgresql_where=text("status = 'pending'")),
+  )
+  id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+  name = Column(String(100), nullable=False)
+  payload = Column(JSON, nullable=False)
+  # "pending" until it runs out of attempts and becomes "failed"; done jobs are deleted
+  status = Column(String(20), nullable=False, default="pending", server_default="pending")
+  attempts = Column(Integer, nullable=False, default=0, server_default="0")
+  # When it is due. Claiming a job pushes this past its lease, so a job
+  # whose worker died becomes due again on its own.
+  run_at = Column(DateTime(timezone=True), nullable=False)
+  created_at = Column(DateTime(timezone=True), nullable=False)
+  last_error = Column(Text, nullable=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import UUID, BigInteger, Column, DateTime, ForeignKey, String, func
+from .base import CommonBase
+
+class MediaModel(CommonBase):
+  __tablename__ = "media"
+  # "<sha256>.<extension>" of the content, see core.storage. Uploading the
+  # same bytes again finds the existing row.
+  id = Column(String(80), primary_key=True)
+  content_type = Column(String(50), nullable=False)
+  size = Column(BigInteger, nullable=False)
+  # Name the first uploader gave it, sanitized
+  filename = Column(String(255), nullable=True)
+  uploader_id = Column(UUID, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+  created_at = Column(DateTime, server_default=func.now(), nullable=False)
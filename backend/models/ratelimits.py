@@ -0,0 +1,13 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, String
+from .base import CommonBase
+
+class RateLimitBucketModel(CommonBase):
+  __tablename__ = "rate_limit_buckets"
+  # Throwaway state, so the migration creates the table UNLOGGED: skipping
+  # the WAL makes every check cheaper, and losing the table in a crash only
+  # refills everyone's buckets
+  key = Column(String(200), primary_key=True)
+  tokens = Column(Float, nullable=False)
+  # Whether the last take succeeded, returned by the same upsert
+  allowed = Column(Boolean, nullable=False)
+  updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from .base import CommonBase
+
+class TagModel(CommonBase):
+  __tablename__ = "tags"
+  tag = Column(String(50), primary_key=True)
+  # Published articles carrying the tag, kept up to date by ops.article_ops
+  # in the same transaction as the publish / unpublish / retag / delete
+  article_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+class TagActivityModel(CommonBase):
+  __tablename__ = "tag_activity"
+  # Articles published with the tag per hour (UTC), the input of the trending
+  # ranking. Hours older than TAGS_TRENDING_WINDOW_HOURS are pruned.
+  hour = Column(DateTime, primary_key=True)
+  tag = Column(String(50), primary_key=True)
+  published = Column(Integer, default=0, server_default="0", nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import UUID, Boolean, Column, DateTime, Enum, String, func
+from sqlalchemy import UUID, Boolean, Column, DateTime, Enum, Index, Integer, String, func
 from .base import CommonBase
 from enum import Enum as PyEnum
 
@@ -10,12 +10,21 @@ class RoleEnum(str, PyEnum):
  
 class UserModel(CommonBase):
   __tablename__ = "users"
+  __table_args__ = (
+    # Keyset pagination for the admin user listing, newest first
+    Index("ix_users_created_at_id", "created_at", "id"),
+    Index("ix_users_role_created_at_id", "role", "created_at", "id"),
+    Index("ix_users_is_verified_created_at_id", "is_verified", "created_at", "id"),
+    # Finds the few authors too big to fan out on write
+    Index("ix_users_follower_count", "follower_count"),
+  )
   id = Column(UUID, primary_key=True)
   username = Column(String(50), unique=True)
   full_name = Column(String(50), nullable=True)
   email = Column(String(100), unique=True)
   password = Column(String(200))
   role = Column(Enum(RoleEnum), default=RoleEnum.USER , nullable=False)
-  created_at = Column(DateTime, server_default=func.now())
+  created_at = Column(DateTime, server_default=func.now(), nullable=False)
   updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
   is_verified = Column(Boolean, default=False)
+  follower_count = Column(Integer, default=0, server_default="0", nullable=False)
@@ -0,0 +1,382 @@
+import re
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+from uuid import UUID
+import uuid
+from sqlalchemy import BigInteger, UUID as SQLUUID, column, select, insert, update, delete, func, tuple_, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.counters import CounterBuffer
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from models import ArticleModel, ArticleTagModel, FollowModel, TimelineEntryModel, UserModel
+from models.articles import IS_PUBLISHED, ArticleStatusEnum
+from ops import tag_ops, timeline_ops
+from ops.article_render import render_fields
+from ops.article_search import search_backend
+
+# Feed pages only ever select these, never the body
+SUMMARY_COLUMNS = (
+    ArticleModel.id,
+    ArticleModel.slug,
+    ArticleModel.title,
+    ArticleModel.summary,
+    ArticleModel.author_id,
+    ArticleModel.published_at,
+    UserModel.username.label("author_username"),
+)
+
+search_duration = metrics.histogram("article_search_duration_seconds", "Article search time")
+
+def _slugify(title: str, article_id: UUID) -> str:
+    base = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")[:100]
+    return f"{base}-{article_id.hex[:8]}" if base else article_id.hex[:8]
+
+async def get_article_by_id(db: AsyncSession, article_id: UUID):
+    result = await db.execute(
+        select(ArticleModel, UserModel.username)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(ArticleModel.id == article_id)
+    )
+    return result.first()
+
+async def get_article_by_slug(db: AsyncSession, slug: str):
+    result = await db.execute(
+        select(ArticleModel, UserModel.username)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(ArticleModel.slug == slug)
+    )
+    return result.first()
+
+async def get_tags_for_articles(db: AsyncSession, article_ids: Iterable[UUID]) -> dict[UUID, list[str]]:
+    article_ids = list(article_ids)
+    if not article_ids:
+        return {}
+    result = await db.execute(
+        select(ArticleTagModel.article_id, ArticleTagModel.tag)
+        .where(ArticleTagModel.article_id.in_(article_ids))
+        .order_by(ArticleTagModel.tag)
+    )
+    tags: dict[UUID, list[str]] = {}
+    for article_id, tag in result.all():
+        tags.setdefault(article_id, []).append(tag)
+    return tags
+
+async def list_feed(
+    db: AsyncSession,
+    limit: int,
+    after: Optional[tuple[datetime, UUID]] = None,
+    author_id: Optional[UUID] = None,
+):
+    # Keyset pagination on (published_at, id), newest first
+    stmt = (
+        select(*SUMMARY_COLUMNS)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(IS_PUBLISHED)
+    )
+    if author_id is not None:
+        stmt = stmt.where(ArticleModel.author_id == author_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(ArticleModel.published_at, ArticleModel.id) < tuple_(*after))
+    stmt = stmt.order_by(ArticleModel.published_at.desc(), ArticleModel.id.desc()).limit(limit)
+    result = await db.execute(stmt)
+    return result.all()
+
+async def list_tag_feed(
+    db: AsyncSession,
+    tag: str,
+    limit: int,
+    after: Optional[tuple[datetime, UUID]] = None,
+):
+    # Walks ix_article_tags_feed, then fetches each page row by primary key
+    stmt = (
+        select(*SUMMARY_COLUMNS)
+        .select_from(ArticleTagModel)
+        .join(ArticleModel, ArticleModel.id == ArticleTagModel.article_id)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(ArticleTagModel.tag == tag, ArticleTagModel.published_at.is_not(None))
+    )
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(ArticleTagModel.published_at, ArticleTagModel.article_id) < tuple_(*after)
+        )
+    stmt = stmt.order_by(
+        ArticleTagModel.published_at.desc(), ArticleTagModel.article_id.desc()
+    ).limit(limit)
+    result = await db.execute(stmt)
+    return result.all()
+
+async def list_following_feed(
+    db: AsyncSession,
+    user_id: UUID,
+    limit: int,
+    after: Optional[tuple[datetime, UUID]] = None,
+):
+    # Fanned-out articles: one range scan over the user's timeline entries.
+    # Entries left behind by an unpublish/republish race don't match the
+    # article's current published_at and drop out here.
+    stmt = (
+        select(*SUMMARY_COLUMNS)
+        .select_from(TimelineEntryModel)
+        .join(
+            ArticleModel,
+            (ArticleModel.id == TimelineEntryModel.article_id)
+            & (ArticleModel.published_at == TimelineEntryModel.published_at),
+        )
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(TimelineEntryModel.user_id == user_id, IS_PUBLISHED)
+    )
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(TimelineEntryModel.published_at, TimelineEntryModel.article_id) < tuple_(*after)
+        )
+    stmt = stmt.order_by(
+        TimelineEntryModel.published_at.desc(), TimelineEntryModel.article_id.desc()
+    ).limit(limit)
+    rows = (await db.execute(stmt)).all()
+
+    # Authors too big to fan out to are read from their own feed index
+    big_authors = select(UserModel.id).where(UserModel.follower_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS)
+    followed_big_authors = select(FollowModel.followee_id).where(
+        FollowModel.follower_id == user_id, FollowModel.followee_id.in_(big_authors)
+    )
+    stmt = (
+        select(*SUMMARY_COLUMNS)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(
+            IS_PUBLISHED,
+            ArticleModel.author_id.in_(followed_big_authors),
+        )
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(ArticleModel.published_at, ArticleModel.id) < tuple_(*after))
+    stmt = stmt.order_by(ArticleModel.published_at.desc(), ArticleModel.id.desc()).limit(limit)
+    rows.extend((await db.execute(stmt)).all())
+
+    # An author who grew past the threshold can show up in both
+    merged = {row.id: row for row in rows}
+    return sorted(merged.values(), key=lambda row: (row.published_at, row.id), reverse=True)[:limit]
+
+async def search_articles(
+    db: AsyncSession,
+    query: str,
+    limit: int,
+    after: Optional[tuple[float, UUID]] = None,
+    prefix: bool = False,
+):
+    """Ranked search over published articles, as (rank, summary row) pairs"""
+    started = time.perf_counter()
+    hits = await search_backend.search(db, query, limit, after, prefix)
+    search_duration.observe(time.perf_counter() - started, backend=settings.SEARCH_BACKEND)
+    if not hits:
+        return []
+    result = await db.execute(
+        select(*SUMMARY_COLUMNS)
+        .join(UserModel, UserModel.id == ArticleModel.author_id)
+        .where(ArticleModel.id.in_([article_id for _, article_id in hits]))
+    )
+    rows = {row.id: row for row in result.all()}
+    # The in-memory index can briefly lag a delete
+    return [(rank, rows[article_id]) for rank, article_id in hits if article_id in rows]
+
+async def _set_tags(db: AsyncSession, article_id: UUID, tags: list[str], published_at: Optional[datetime]):
+    result = await db.execute(
+        delete(ArticleTagModel).where(ArticleTagModel.article_id == article_id).returning(ArticleTagModel.tag)
+    )
+    if published_at is not None:
+        old_tags = set(result.scalars().all())
+        await tag_ops.published_tags_changed(
+            db, published_at, added=set(tags) - old_tags, removed=old_tags - set(tags)
+        )
+    if tags:
+        await db.execute(
+            insert(ArticleTagModel),
+            [{"article_id": article_id, "tag": tag, "published_at": published_at} for tag in tags],
+        )
+
+async def create_article(
+    db: AsyncSession,
+    author_id: UUID,
+    title: str,
+    body: str,
+    summary: Optional[str] = None,
+    tags: list[str] = [],
+    publish: bool = False,
+    cover_media_id: Optional[str] = None,
+):
+    article_id = uuid.uuid4()
+    stmt = (
+        insert(ArticleModel)
+        .values(
+            id=article_id,
+            author_id=author_id,
+            slug=_slugify(title, article_id),
+            title=title,
+            summary=summary,
+            cover_media_id=cover_media_id,
+            body=body,
+            **render_fields(body),
+            status=ArticleStatusEnum.PUBLISHED if publish else ArticleStatusEnum.DRAFT,
+            published_at=func.now() if publish else None,
+        )
+        .returning(ArticleModel)
+    )
+    result = await db.execute(stmt)
+    article = result.scalars().one()
+    if tags:
+        await db.execute(
+            insert(ArticleTagModel),
+            [{"article_id": article_id, "tag": tag, "published_at": article.published_at} for tag in tags],
+        )
+        if publish:
+            await tag_ops.published_tags_changed(db, article.published_at, added=tags)
+    await search_backend.article_changed(db, article_id)
+    await db.commit()
+    if publish:
+        await timeline_ops.schedule_fan_out(article_id)
+    return article
+
+async def update_article(db: AsyncSession, article_id: UUID, tags: Optional[list[str]] = None, **kwargs):
+    if "body" in kwargs:
+        kwargs.update(render_fields(kwargs["body"]))
+    if tags is not None and not kwargs:
+        # Tag-only edits still change the article's representation
+        kwargs["updated_at"] = func.now()
+    if kwargs:
+        result = await db.execute(
+            update(ArticleModel)
+            .where(ArticleModel.id == article_id)
+            .values(**kwargs)
+            .returning(ArticleModel)
+        )
+    else:
+        result = await db.execute(select(ArticleModel).where(ArticleModel.id == article_id))
+    article = result.scalars().first()
+    if article is not None and tags is not None:
+        await _set_tags(db, article_id, tags, article.published_at)
+    if article is not None and ("title" in kwargs or "body" in kwargs):
+        await search_backend.article_changed(db, article_id)
+    await db.commit()
+    return article
+
+async def publish_article(db: AsyncSession, article_id: UUID):
+    result = await db.execute(
+        update(ArticleModel)
+        .where(ArticleModel.id == article_id, ArticleModel.status == ArticleStatusEnum.DRAFT)
+        .values(status=ArticleStatusEnum.PUBLISHED, published_at=func.now())
+        .returning(ArticleModel)
+    )
+    article = result.scalars().first()
+    if article is None:
+        # Already published, or gone
+        return None
+    result = await db.execute(
+        update(ArticleTagModel)
+        .where(ArticleTagModel.article_id == article_id)
+        .values(published_at=article.published_at)
+        .returning(ArticleTagModel.tag)
+    )
+    await tag_ops.published_tags_changed(db, article.published_at, added=result.scalars().all())
+    await search_backend.article_changed(db, article_id, content_changed=False)
+    await db.commit()
+    await timeline_ops.schedule_fan_out(article_id)
+    return article
+
+async def unpublish_article(db: AsyncSession, article_id: UUID):
+    result = await db.execute(
+        update(ArticleModel)
+        .where(ArticleModel.id == article_id, IS_PUBLISHED)
+        .values(status=ArticleStatusEnum.DRAFT, published_at=None)
+        .returning(ArticleModel)
+    )
+    article = result.scalars().first()
+    if article is None:
+        return None
+    # The tag rows still carry the publish time the counts were credited at
+    result = await db.execute(
+        select(ArticleTagModel.tag, ArticleTagModel.published_at).where(ArticleTagModel.article_id == article_id)
+    )
+    await tag_ops.tag_rows_removed(db, result.all())
+    await db.execute(
+        update(ArticleTagModel)
+        .where(ArticleTagModel.article_id == article_id)
+        .values(published_at=None)
+    )
+    await search_backend.article_changed(db, article_id, content_changed=False)
+    await db.commit()
+    await timeline_ops.schedule_retract(article_id)
+    return article
+
+async def delete_article(db: AsyncSession, article_id: UUID):
+    # Lock the article first, like the other writers, so a concurrent
+    # unpublish can't uncount the same tags
+    await db.execute(select(ArticleModel.id).where(ArticleModel.id == article_id).with_for_update())
+    # Deleted here rather than by the cascade, to uncount a published article's tags
+    result = await db.execute(
+        delete(ArticleTagModel)
+        .where(ArticleTagModel.article_id == article_id)
+        .returning(ArticleTagModel.tag, ArticleTagModel.published_at)
+    )
+    await tag_ops.tag_rows_removed(db, result.all())
+    stmt = delete(ArticleModel).where(ArticleModel.id == article_id).returning(ArticleModel)
+    result = await db.execute(stmt)
+    await search_backend.article_changed(db, article_id, content_changed=False)
+    await db.commit()
+    return result.scalars().first()
+
+async def author_deleted(db: AsyncSession, author_id: UUID):
+    """Uncount the tags of an author's articles before deleting the author
+    (whose articles go with them by cascade), in `db`'s transaction"""
+    # Locked first, like the other article writers
+    await db.execute(select(ArticleModel.id).where(ArticleModel.author_id == author_id).with_for_update())
+    result = await db.execute(
+        delete(ArticleTagModel)
+        .where(ArticleTagModel.article_id.in_(select(ArticleModel.id).where(ArticleModel.author_id == author_id)))
+        .returning(ArticleTagModel.tag, ArticleTagModel.published_at)
+    )
+    await tag_ops.tag_rows_removed(db, result.all())
+
+async def flush_article_counters(increments: dict[UUID, dict[str, int]]):
+    """Apply buffered view / clap increments with batched UPDATE ... FROM (VALUES ...)"""
+    # Sorted, so flushes from several workers lock rows in the same order
+    rows = [
+        (article_id, counts.get("views", 0), counts.get("claps", 0))
+        for article_id, counts in sorted(increments.items())
+    ]
+    async with async_db.get_session() as db:
+        for start in range(0, len(rows), settings.COUNTER_FLUSH_BATCH_SIZE):
+            batch = values(
+                column("id", SQLUUID), column("views", BigInteger), column("claps", BigInteger),
+                name="increments",
+            ).data(rows[start:start + settings.COUNTER_FLUSH_BATCH_SIZE])
+            await db.execute(
+                update(ArticleModel)
+                .where(ArticleModel.id == batch.c.id)
+                .values(
+                    views=ArticleModel.views + batch.c.views,
+                    claps=ArticleModel.claps + batch.c.claps,
+                    updated_at=ArticleModel.updated_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        # One transaction, so a failed flush can be retried without double counting
+        await db.commit()
+
+def record_view(article_id: UUID):
+    article_counters.add(article_id, views=1)
+
+def record_claps(article_id: UUID, count: int) -> bool:
+    return article_counters.add(article_id, claps=count)
+
+def pending_counts(article_id: UUID) -> dict[str, int]:
+    """Views and claps buffered in this worker and not written yet"""
+    return article_counters.pending(article_id)
+
+# Global instance
+article_counters = CounterBuffer(
+    "articles",
+    flush_article_counters,
+    interval=settings.COUNTER_FLUSH_INTERVAL_SECONDS,
+    max_keys=settings.COUNTER_BUFFER_MAX_KEYS,
+)
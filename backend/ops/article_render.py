@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.db import async_db
+from core.markdown import RENDERER_VERSION, content_hash, render_cached, render_markdown, render_many, rendered_cache
+from core.metrics import metrics
+from core.settings import settings
+from core.workers import background_worker
+from models import ArticleModel
+
+logger = logging.getLogger(__name__)
+
+articles_rerendered = metrics.counter("articles_rerendered_total", "Article bodies re-rendered in the background")
+
+def render_fields(body: str) -> dict:
+    """Column values storing the rendered HTML of a new or edited body"""
+    digest, html = render_cached(body)
+    return {"body_html": html, "body_hash": digest, "renderer_version": RENDERER_VERSION}
+
+async def get_body_html(db: AsyncSession, article: ArticleModel) -> str:
+    """Rendered body, from the cache, the stored HTML or (for stale rows) a fresh render"""
+    digest = article.body_hash or content_hash(article.body)
+    html = rendered_cache.get(digest)
+    if html is not None:
+        return html
+    generation = rendered_cache.generation
+    if article.renderer_version == RENDERER_VERSION and article.body_hash:
+        html = (await db.execute(
+            select(ArticleModel.body_html).where(ArticleModel.id == article.id)
+        )).scalar_one_or_none()
+    if html is None:
+        # Written by an older renderer and not re-rendered yet
+        html = render_markdown(article.body)
+    rendered_cache.set(digest, html, generation)
+    return html
+
+async def rerender_stale_articles():
+    """Re-render bodies stored by an older renderer version.
+
+    Batches are rendered on a process pool so the event loop keeps serving
+    requests. Rows are locked with SKIP LOCKED, so several app workers share
+    the job instead of repeating it, and a row edited in the meantime is
+    left alone since its new HTML is already current.
+    """
+    loop = asyncio.get_running_loop()
+    stored = (
+        update(ArticleModel.__table__)
+        .where(
+            ArticleModel.id == bindparam("b_id"),
+            ArticleModel.body_hash.is_not_distinct_from(bindparam("b_old_hash")),
+        )
+        .values(
+            body_html=bindparam("b_html"),
+            body_hash=bindparam("b_hash"),
+            renderer_version=RENDERER_VERSION,
+            updated_at=ArticleModel.updated_at,
+        )
+    )
+    last_id, rerendered = None, 0
+    with ProcessPoolExecutor(max_workers=settings.MARKDOWN_RERENDER_WORKERS) as executor:
+        async with async_db.get_session() as db:
+            while True:
+                stmt = (
+                    select(ArticleModel.id, ArticleModel.body, ArticleModel.body_hash)
+                    .where(ArticleModel.renderer_version < RENDERER_VERSION)
+                    .order_by(ArticleModel.id)
+                    .limit(settings.MARKDOWN_RERENDER_BATCH_SIZE)
+                    .with_for_update(skip_locked=True)
+                )
+                if last_id is not None:
+                    stmt = stmt.where(ArticleModel.id > last_id)
+                rows = (await db.execute(stmt)).all()
+                if not rows:
+                    await db.commit()
+                    break
+                # Split across the pool, so each process gets one chunk
+                size = -(-len(rows) // settings.MARKDOWN_RERENDER_WORKERS)
+                chunks = await asyncio.gather(*(
+                    loop.run_in_executor(executor, render_many, [row.body for row in rows[start:start + size]])
+                    for start in range(0, len(rows), size)
+                ))
+                htmls = [html for chunk in chunks for html in chunk]
+                await db.execute(stored, [
+                    {"b_id": row.id, "b_old_hash": row.body_hash, "b_html": html, "b_hash": content_hash(row.body)}
+                    for row, html in zip(rows, htmls)
+                ])
+                await db.commit()
+                articles_rerendered.inc(len(rows))
+                rerendered += len(rows)
+                last_id = rows[-1].id
+    if rerendered:
+        logger.info("Re-rendered %d article bodies with renderer version %d", rerendered, RENDERER_VERSION)
+
+async def schedule_rerender():
+    await background_worker.submit(rerender_stale_articles)
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import Float, event, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.bus import invalidation_bus
+from core.db import async_db
+from core.metrics import metrics
+from core.search import InvertedIndex
+from core.settings import settings
+from models import ArticleModel, UserModel
+from models.articles import IS_PUBLISHED
+
+logger = logging.getLogger(__name__)
+
+# Same relative weights as the Postgres A/B/C labels
+TITLE_WEIGHT = 3.0
+AUTHOR_WEIGHT = 2.0
+BODY_WEIGHT = 1.0
+
+_author_names = (
+    select(func.concat_ws(" ", UserModel.username, UserModel.full_name))
+    .where(UserModel.id == ArticleModel.author_id)
+    .scalar_subquery()
+)
+
+
+class SearchBackend(ABC):
+    """Keeps an article search index in step with writes and queries it"""
+
+    async def start(self):
+        """Start the backend (call this at startup)"""
+
+    async def stop(self):
+        """Stop the backend (call this at shutdown)"""
+
+    @abstractmethod
+    async def article_changed(self, db: AsyncSession, article_id: UUID, content_changed: bool = True):
+        """Reindex an article written in `db`'s transaction (call before committing)"""
+
+    @abstractmethod
+    async def author_changed(self, db: AsyncSession, author_id: UUID):
+        """Reindex an author's articles after their name changed (call before committing)"""
+
+    @abstractmethod
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int,
+        after: Optional[tuple[float, UUID]] = None,
+        prefix: bool = False,
+    ) -> list[tuple[float, UUID]]:
+        """Return up to `limit` (rank, article id) pairs for published articles, best first"""
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Search over the weighted articles.search_vector column and its GIN index"""
+
+    def _document(self):
+        language = settings.SEARCH_LANGUAGE
+        return (
+            func.setweight(func.to_tsvector(language, ArticleModel.title), "A")
+            .op("||")(func.setweight(func.to_tsvector(language, func.coalesce(_author_names, "")), "B"))
+            .op("||")(func.setweight(func.to_tsvector(language, ArticleModel.body), "C"))
+        )
+
+    async def article_changed(self, db: AsyncSession, article_id: UUID, content_changed: bool = True):
+        # The partial index already follows status changes. Reindexing keeps
+        # updated_at as is, it isn't an edit.
+        if content_changed:
+            await db.execute(
+                update(ArticleModel)
+                .where(ArticleModel.id == article_id)
+                .values(search_vector=self._document(), updated_at=ArticleModel.updated_at)
+            )
+
+    async def author_changed(self, db: AsyncSession, author_id: UUID):
+        await db.execute(
+            update(ArticleModel)
+            .where(ArticleModel.author_id == author_id)
+            .values(search_vector=self._document(), updated_at=ArticleModel.updated_at)
+        )
+
+    @staticmethod
+    def _tsquery(query: str, prefix: bool) -> Optional[str]:
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return None
+        if prefix:
+            terms[-1] += ":*"
+        return " & ".join(terms)
+
+    async def search(self, db, query, limit, after=None, prefix=False):
+        tsquery = self._tsquery(query, prefix)
+        if tsquery is None:
+            return []
+        ts_query = func.to_tsquery(settings.SEARCH_LANGUAGE, tsquery)
+        rank = func.ts_rank_cd(ArticleModel.search_vector, ts_query, type_=Float)
+        stmt = select(rank, ArticleModel.id).where(
+            IS_PUBLISHED,
+            ArticleModel.search_vector.op("@@")(ts_query),
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(rank, ArticleModel.id) < tuple_(*after))
+        stmt = stmt.order_by(rank.desc(), ArticleModel.id.desc()).limit(limit)
+        result = await db.execute(stmt)
+        return [(float(score), article_id) for score, article_id in result.all()]
+
+
+class MemorySearchBackend(SearchBackend):
+    """Per-process inverted index, for tests and small single-box deployments.
+
+    Built from the database at startup, then kept current: writers mark
+    articles dirty once their transaction commits, other workers hear about
+    it over the invalidation bus, and a refresh task reloads dirty articles.
+    Terms aren't stemmed, unlike Postgres.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.index = InvertedIndex(settings.SEARCH_PREFIX_EXPANSIONS)
+        self._batch_size = batch_size
+        # "articles" / "authors" -> ids waiting to be reloaded
+        self._dirty: dict[str, set[UUID]] = {"articles": set(), "authors": set()}
+        self._reload = False
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _mark(self, kind: str, key: Optional[str]):
+        if key is None:
+            self._reload = True
+        else:
+            self._dirty[kind].add(UUID(key))
+        self._wake.set()
+
+    async def start(self):
+        invalidation_bus.subscribe("search_articles", lambda key: self._mark("articles", key))
+        invalidation_bus.subscribe("search_authors", lambda key: self._mark("authors", key))
+        if self._task is None:
+            self._reload = True
+            self._wake.set()
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _notify(self, db: AsyncSession, kind: str, key: UUID):
+        await invalidation_bus.publish(db, f"search_{kind}", str(key))
+        # The bus skips our own messages (or delivers them before the commit)
+        event.listen(db.sync_session, "after_commit", lambda _: self._mark(kind, str(key)), once=True)
+
+    async def article_changed(self, db, article_id, content_changed=True):
+        await self._notify(db, "articles", article_id)
+
+    async def author_changed(self, db, author_id):
+        await self._notify(db, "authors", author_id)
+
+    @staticmethod
+    def _index_rows(index: InvertedIndex, rows):
+        for article_id, title, body, username, full_name in rows:
+            index.add(article_id, (
+                (title, TITLE_WEIGHT),
+                (username, AUTHOR_WEIGHT),
+                (full_name, AUTHOR_WEIGHT),
+                (body, BODY_WEIGHT),
+            ))
+
+    def _select_documents(self):
+        return (
+            select(ArticleModel.id, ArticleModel.title, ArticleModel.body, UserModel.username, UserModel.full_name)
+            .join(UserModel, UserModel.id == ArticleModel.author_id)
+            .where(IS_PUBLISHED)
+        )
+
+    async def _rebuild(self):
+        index = InvertedIndex(settings.SEARCH_PREFIX_EXPANSIONS)
+        async with async_db.get_read_session() as db:
+            result = await db.stream(self._select_documents().execution_options(yield_per=self._batch_size))
+            async for rows in result.partitions():
+                self._index_rows(index, rows)
+        self.index = index
+        logger.info("Search index built with %d articles", len(index))
+
+    async def _refresh(self):
+        if self._reload:
+            self._reload = False
+            self._dirty = {"articles": set(), "authors": set()}
+            await self._rebuild()
+            return
+        article_ids, author_ids = self._dirty["articles"], self._dirty["authors"]
+        self._dirty = {"articles": set(), "authors": set()}
+        # Our own writes are committed, so read them from the primary
+        async with async_db.get_session() as db:
+            if author_ids:
+                result = await db.execute(select(ArticleModel.id).where(ArticleModel.author_id.in_(author_ids)))
+                article_ids.update(result.scalars().all())
+            if not article_ids:
+                return
+            result = await db.execute(self._select_documents().where(ArticleModel.id.in_(article_ids)))
+            rows = result.all()
+        for article_id in article_ids:
+            self.index.remove(article_id)
+        self._index_rows(self.index, rows)
+
+    async def _refresh_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception("Search index refresh failed, retrying")
+                self._reload = True
+                await asyncio.sleep(1)
+                self._wake.set()
+
+    async def search(self, db, query, limit, after=None, prefix=False):
+        return self.index.search(query, limit, after, prefix)
+
+
+def create_search_backend() -> SearchBackend:
+    if settings.SEARCH_BACKEND == "memory":
+        return MemorySearchBackend()
+    return PostgresSearchBackend()
+
+# Global instance
+search_backend = create_search_backend()
+metrics.callback(
+    "article_search_index_documents", "Articles in the in-memory search index", "gauge",
+    lambda: len(search_backend.index) if isinstance(search_backend, MemorySearchBackend) else 0,
+)
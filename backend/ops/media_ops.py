@@ -0,0 +1,30 @@
+from typing import Optional
+from uuid import UUID
+from pathvalidate import sanitize_filename
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.storage import StoredMedia
+from models import MediaModel
+
+async def get_media(db: AsyncSession, media_id: str):
+    result = await db.execute(select(MediaModel).where(MediaModel.id == media_id))
+    return result.scalars().first()
+
+async def create_media(db: AsyncSession, stored: StoredMedia, filename: Optional[str], uploader_id: UUID):
+    """Record an upload, or return the existing row for content stored before"""
+    if filename:
+        filename = sanitize_filename(filename, max_len=255) or None
+    await db.execute(
+        pg_insert(MediaModel)
+        .values(
+            id=stored.id,
+            content_type=stored.content_type,
+            size=stored.size,
+            filename=filename,
+            uploader_id=uploader_id,
+        )
+        .on_conflict_do_nothing()
+    )
+    await db.commit()
+    return await get_media(db, stored.id)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from models import TagActivityModel, TagModel
+
+logger = logging.getLogger(__name__)
+
+tag_refreshes = metrics.counter("tag_stats_refreshes_total", "Tag count / trending refreshes, by outcome")
+
+def _utc_now() -> datetime:
+    # Naive UTC, like the DateTime columns written with the database's now()
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+def _window_start(now: datetime) -> datetime:
+    return _hour(now) - timedelta(hours=settings.TAGS_TRENDING_WINDOW_HOURS - 1)
+
+async def _upsert_counts(db: AsyncSession, deltas: dict[str, int]):
+    stmt = pg_insert(TagModel).values([{"tag": tag, "article_count": delta} for tag, delta in deltas.items()])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TagModel.tag],
+        set_={"article_count": TagModel.article_count + stmt.excluded.article_count},
+    ))
+
+async def _upsert_activity(db: AsyncSession, deltas: dict[tuple[datetime, str], int]):
+    stmt = pg_insert(TagActivityModel).values([
+        {"hour": hour, "tag": tag, "published": delta} for (hour, tag), delta in deltas.items()
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TagActivityModel.hour, TagActivityModel.tag],
+        set_={"published": TagActivityModel.published + stmt.excluded.published},
+    ))
+
+async def _apply(db: AsyncSession, changes: Iterable[tuple[str, datetime, int]]):
+    """Add (tag, published_at, delta) changes to the counts and the hours still in the window"""
+    counts: Counter = Counter()
+    activity: Counter = Counter()
+    window_start = _window_start(_utc_now())
+    for tag, published_at, delta in changes:
+        counts[tag] += delta
+        hour = _hour(published_at)
+        if hour >= window_start:
+            activity[hour, tag] += delta
+    # Sorted, so concurrent writers lock the rows in the same order
+    counts = {tag: delta for tag, delta in sorted(counts.items()) if delta}
+    activity = {key: delta for key, delta in sorted(activity.items()) if delta}
+    if counts:
+        await _upsert_counts(db, counts)
+    if activity:
+        await _upsert_activity(db, activity)
+
+async def published_tags_changed(
+    db: AsyncSession,
+    published_at: datetime,
+    added: Iterable[str] = (),
+    removed: Iterable[str] = (),
+):
+    """Count a published article (published at `published_at`) gaining `added`
+    and losing `removed` tags, in `db`'s transaction.
+
+    Publishing adds all of an article's tags, unpublishing removes them. The
+    article's publish hour is credited too, so the activity always reflects
+    what is published now and moves with a retag.
+    """
+    await _apply(db, [
+        *((tag, published_at, 1) for tag in set(added)),
+        *((tag, published_at, -1) for tag in set(removed)),
+    ])
+
+async def tag_rows_removed(db: AsyncSession, rows: Iterable):
+    """Uncount the (tag, published_at) article_tags rows of articles being
+    unpublished or deleted, in `db`'s transaction. Draft rows are skipped."""
+    await _apply(db, [(row.tag, row.published_at, -1) for row in rows if row.published_at is not None])
+
+
+class TagStats:
+    """Tag counts and the trending ranking, reloaded by every worker every
+    TAGS_REFRESH_SECONDS and served from memory in between.
+
+    Counts come straight from the tags table. A tag's trending score sums the
+    articles published with it per hour over the last TAGS_TRENDING_WINDOW_HOURS,
+    each hour weighted down by half every TAGS_TRENDING_HALF_LIFE_HOURS. Both
+    read small tables that writers keep up to date incrementally, never the
+    articles.
+    """
+
+    def __init__(self):
+        # {"tag", "article_count"}, most used first, at most TAGS_CACHE_SIZE
+        self.top: list[dict] = []
+        self.counts: dict[str, int] = {}
+        # {"tag", "score", "article_count"}, highest score first
+        self.trending: list[dict] = []
+        self.refreshed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get_count(self, tag: str) -> int:
+        """Published articles tagged `tag`, from memory for the most used tags
+        (a session is only opened for the others)"""
+        count = self.counts.get(tag)
+        if count is None:
+            async with async_db.get_read_session() as db:
+                count = await db.scalar(select(TagModel.article_count).where(TagModel.tag == tag)) or 0
+        return count
+
+    async def refresh(self):
+        now = _utc_now()
+        start = _window_start(now)
+        half_life = settings.TAGS_TRENDING_HALF_LIFE_HOURS * 3600
+        weights = {}
+        for age in range(settings.TAGS_TRENDING_WINDOW_HOURS):
+            hour = _hour(now) - timedelta(hours=age)
+            weights[hour] = 0.5 ** ((now - hour).total_seconds() / half_life)
+        score = func.sum(
+            TagActivityModel.published * case(weights, value=TagActivityModel.hour, else_=0.0)
+        ).label("score")
+        async with async_db.get_read_session() as db:
+            top = await db.execute(
+                select(TagModel.tag, TagModel.article_count)
+                .where(TagModel.article_count > 0)
+                .order_by(TagModel.article_count.desc(), TagModel.tag)
+                .limit(settings.TAGS_CACHE_SIZE)
+            )
+            trending = await db.execute(
+                select(TagActivityModel.tag, score, TagModel.article_count)
+                .join(TagModel, TagModel.tag == TagActivityModel.tag)
+                .where(TagActivityModel.hour >= start, TagModel.article_count > 0)
+                .group_by(TagActivityModel.tag, TagModel.article_count)
+                .having(score > 0)
+                .order_by(score.desc(), TagActivityModel.tag)
+                .limit(settings.TAGS_TRENDING_SIZE)
+            )
+            self.top = [{"tag": tag, "article_count": count} for tag, count in top]
+            self.trending = [
+                {"tag": tag, "score": round(score, 4), "article_count": count}
+                for tag, score, count in trending
+            ]
+        self.counts = {item["tag"]: item["article_count"] for item in self.top}
+        self.refreshed_at = now.replace(tzinfo=timezone.utc)
+        # Hours that slid out of the window. Every worker tries, it's idempotent.
+        async with async_db.get_session() as db:
+            await db.execute(delete(TagActivityModel).where(TagActivityModel.hour < start))
+            await db.commit()
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+                tag_refreshes.inc(outcome="ok")
+            except Exception:
+                tag_refreshes.inc(outcome="error")
+                logger.exception("Refreshing tag stats failed, keeping the previous ones")
+            await asyncio.sleep(settings.TAGS_REFRESH_SECONDS)
+
+
+# Global instance
+tag_stats = TagStats()
+metrics.callback(
+    "tag_stats_age_seconds", "Time since this worker last refreshed its tag counts and trending ranking", "gauge",
+    lambda: (datetime.now(timezone.utc) - tag_stats.refreshed_at).total_seconds() if tag_stats.refreshed_at else 0,
+)
@@ -0,0 +1,152 @@
+from uuid import UUID
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from core.workers import background_worker
+from models import ArticleModel, FollowModel, TimelineEntryModel, UserModel
+from models.articles import IS_PUBLISHED, ArticleStatusEnum
+
+timeline_fanout_entries = metrics.counter("timeline_fanout_entries_total", "Timeline entries written by fan-out")
+timeline_fanout_skipped = metrics.counter(
+    "timeline_fanout_skipped_total", "Articles left to fan-out-on-read because the author is too big"
+)
+
+async def follow_user(db: AsyncSession, follower_id: UUID, followee_id: UUID) -> bool:
+    """Follow an author and backfill their recent articles. False if already following"""
+    result = await db.execute(
+        pg_insert(FollowModel)
+        .values(follower_id=follower_id, followee_id=followee_id)
+        .on_conflict_do_nothing()
+        .returning(FollowModel.followee_id)
+    )
+    if result.first() is None:
+        await db.rollback()
+        return False
+    result = await db.execute(
+        update(UserModel)
+        .where(UserModel.id == followee_id)
+        .values(follower_count=UserModel.follower_count + 1)
+        .returning(UserModel.follower_count)
+    )
+    if result.scalar_one() <= settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        recent = (
+            select(ArticleModel.published_at, ArticleModel.id, ArticleModel.author_id)
+            .where(ArticleModel.author_id == followee_id, IS_PUBLISHED)
+            .order_by(ArticleModel.published_at.desc())
+            .limit(settings.TIMELINE_BACKFILL_ARTICLES)
+        )
+        rows = (await db.execute(recent)).all()
+        if rows:
+            await db.execute(
+                pg_insert(TimelineEntryModel)
+                .values([
+                    {"user_id": follower_id, "published_at": published_at, "article_id": article_id, "author_id": author_id}
+                    for published_at, article_id, author_id in rows
+                ])
+                .on_conflict_do_nothing()
+            )
+    await db.commit()
+    return True
+
+async def unfollow_user(db: AsyncSession, follower_id: UUID, followee_id: UUID) -> bool:
+    """Stop following an author and drop their articles from the timeline. False if not following"""
+    result = await db.execute(
+        delete(FollowModel)
+        .where(FollowModel.follower_id == follower_id, FollowModel.followee_id == followee_id)
+        .returning(FollowModel.followee_id)
+    )
+    if result.first() is None:
+        await db.rollback()
+        return False
+    await db.execute(
+        update(UserModel)
+        .where(UserModel.id == followee_id)
+        .values(follower_count=UserModel.follower_count - 1)
+    )
+    await db.execute(
+        delete(TimelineEntryModel)
+        .where(TimelineEntryModel.user_id == follower_id, TimelineEntryModel.author_id == followee_id)
+    )
+    await db.commit()
+    return True
+
+async def follower_deleted(db: AsyncSession, user_id: UUID):
+    """Uncount a user's follows before deleting the user (whose follows
+    would otherwise go by cascade), in `db`'s transaction"""
+    result = await db.execute(
+        delete(FollowModel).where(FollowModel.follower_id == user_id).returning(FollowModel.followee_id)
+    )
+    followee_ids = sorted(result.scalars().all())
+    if followee_ids:
+        await db.execute(
+            update(UserModel)
+            .where(UserModel.id.in_(followee_ids))
+            .values(follower_count=UserModel.follower_count - 1)
+        )
+
+async def fan_out_article(article_id: UUID):
+    """Copy a published article into its author's followers' timelines.
+
+    Followers are walked in batches of TIMELINE_FANOUT_BATCH_SIZE, each in
+    its own short transaction. Authors above TIMELINE_FANOUT_MAX_FOLLOWERS
+    are skipped; their articles are merged into timelines at read time.
+    """
+    async with async_db.get_session() as db:
+        result = await db.execute(
+            select(ArticleModel.author_id, ArticleModel.published_at, ArticleModel.status, UserModel.follower_count)
+            .join(UserModel, UserModel.id == ArticleModel.author_id)
+            .where(ArticleModel.id == article_id)
+        )
+        article = result.first()
+        if article is None or article.status != ArticleStatusEnum.PUBLISHED:
+            return
+        if article.follower_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+            timeline_fanout_skipped.inc()
+            return
+
+        last_follower_id = None
+        while True:
+            stmt = (
+                select(FollowModel.follower_id)
+                .where(FollowModel.followee_id == article.author_id)
+                .order_by(FollowModel.follower_id)
+                .limit(settings.TIMELINE_FANOUT_BATCH_SIZE)
+            )
+            if last_follower_id is not None:
+                stmt = stmt.where(FollowModel.follower_id > last_follower_id)
+            follower_ids = (await db.execute(stmt)).scalars().all()
+            if not follower_ids:
+                break
+            await db.execute(
+                pg_insert(TimelineEntryModel)
+                .values([
+                    {
+                        "user_id": follower_id,
+                        "published_at": article.published_at,
+                        "article_id": article_id,
+                        "author_id": article.author_id,
+                    }
+                    for follower_id in follower_ids
+                ])
+                .on_conflict_do_nothing()
+            )
+            await db.commit()
+            timeline_fanout_entries.inc(len(follower_ids))
+            if len(follower_ids) < settings.TIMELINE_FANOUT_BATCH_SIZE:
+                break
+            last_follower_id = follower_ids[-1]
+
+async def retract_article(article_id: UUID):
+    """Remove an unpublished article from every timeline"""
+    async with async_db.get_session() as db:
+        await db.execute(delete(TimelineEntryModel).where(TimelineEntryModel.article_id == article_id))
+        await db.commit()
+
+async def schedule_fan_out(article_id: UUID):
+    await background_worker.submit(fan_out_article, article_id)
+
+async def schedule_retract(article_id: UUID):
+    await background_worker.submit(retract_article, article_id)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import math
+from typing import Optional
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.bloom import BloomFilter
+from core.bus import invalidation_bus
+from core.cache import TTLCache
+from core.db import async_db
+from core.metrics import metrics
+from core.settings import settings
+from models import UserModel
+
+logger = logging.getLogger(__name__)
+
+availability_checks = metrics.counter(
+    "user_availability_checks_total",
+    "Username / email availability checks, by what answered them (filter, negative_cache, database)",
+)
+
+# Headroom left when sizing the filter, so it doesn't fill up right after a rebuild
+_GROWTH = 1.25
+
+
+def _key(field: str, value: str) -> str:
+    return f"{field}:{value}"
+
+
+class UserAvailability:
+    """Answers "is this username / email free?" mostly without the database.
+
+    A Bloom filter of every taken name, built from the users table at
+    startup, says for sure when a name is free. Only possible hits are
+    queried, and names found free are kept in a small exact negative cache
+    for the next keystroke. Writers add their names once their transaction
+    commits and other workers hear about them over the invalidation bus.
+    Names freed by an update or a delete stay in the filter and just cost a
+    query, until the next rebuild.
+    """
+
+    def __init__(self, batch_size: int = 2000):
+        # Small batches: hashing one blocks the event loop for a few milliseconds
+        # None until built, meanwhile every check goes to the database
+        self.filter: Optional[BloomFilter] = None
+        self._building: Optional[BloomFilter] = None
+        self._free = TTLCache(
+            maxsize=settings.USER_AVAILABILITY_NEGATIVE_CACHE_SIZE,
+            ttl=settings.USER_AVAILABILITY_NEGATIVE_CACHE_TTL_SECONDS,
+        )
+        self._batch_size = batch_size
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        invalidation_bus.subscribe("user_names", self._on_invalidation)
+        if self._task is None:
+            self._wake.set()
+            self._task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _add(self, key: str):
+        for bloom in (self.filter, self._building):
+            if bloom is not None:
+                bloom.add(key)
+        self._free.invalidate(key)
+        if self.filter is not None and len(self.filter) > self.filter.capacity:
+            # Still correct, but more and more free names cost a query
+            self._wake.set()
+
+    def _on_invalidation(self, key: Optional[str]):
+        if key is None:
+            # Names may have been missed, trust only the database until rebuilt
+            self.filter = None
+            self._free.clear()
+            self._wake.set()
+        else:
+            self._add(key)
+
+    async def names_taken(self, db: AsyncSession, names: list[tuple[str, str]]):
+        """Record (field, value) names written in `db`'s transaction (call before committing)"""
+        keys = [_key(field, value) for field, value in names if value is not None]
+        if not keys:
+            return
+        await invalidation_bus.publish_many(db, "user_names", keys)
+        # The bus skips our own messages (or delivers them before the commit)
+        event.listen(db.sync_session, "after_commit", lambda _: [self._add(key) for key in keys], once=True)
+
+    async def is_available(self, db: AsyncSession, field: str, value: str) -> bool:
+        """Whether no user has `value` as their `field` ("username" or "email")"""
+        key = _key(field, value)
+        if self.filter is not None and key not in self.filter:
+            availability_checks.inc(source="filter")
+            return True
+        if self._free.get(key):
+            availability_checks.inc(source="negative_cache")
+            return True
+        generation = self._free.generation
+        column = getattr(UserModel, field)
+        result = await db.execute(select(UserModel.id).where(column == value).limit(1))
+        available = result.first() is None
+        if available:
+            self._free.set(key, True, generation)
+        availability_checks.inc(source="database")
+        return available
+
+    async def _rebuild(self):
+        # From the primary: a lagging replica could miss names whose
+        # commit-time additions went to the filter being replaced
+        async with async_db.get_session() as db:
+            users = await db.scalar(select(func.count()).select_from(UserModel))
+            capacity = max(settings.USER_AVAILABILITY_CAPACITY, math.ceil(users * 2 * _GROWTH))
+            # Names committed from here on are added to both filters
+            self._building = BloomFilter(capacity, settings.USER_AVAILABILITY_FALSE_POSITIVE_RATE)
+            stmt = select(UserModel.username, UserModel.email).execution_options(yield_per=self._batch_size)
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                for username, email in rows:
+                    if username is not None:
+                        self._building.add(_key("username", username))
+                    if email is not None:
+                        self._building.add(_key("email", email))
+        self.filter, self._building = self._building, None
+        logger.info(
+            "Availability filter built with %d names in %.1f MiB (%d hashes, estimated false positive rate %.4f)",
+            len(self.filter), self.filter.size_bytes / 2**20, self.filter.num_hashes, self.filter.estimated_error_rate,
+        )
+
+    async def _rebuild_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self._rebuild()
+            except Exception:
+                self._building = None
+                logger.exception("Building the availability filter failed, retrying")
+                await asyncio.sleep(1)
+                self._wake.set()
+
+
+# Global instance
+user_availability = UserAvailability()
+metrics.callback(
+    "user_availability_filter_names", "Names added to the availability Bloom filter", "gauge",
+    lambda: len(user_availability.filter) if user_availability.filter is not None else 0,
+)
+metrics.callback(
+    "user_availability_filter_bytes", "Memory used by the availability Bloom filter", "gauge",
+    lambda: user_availability.filter.size_bytes if user_availability.filter is not None else 0,
+)
+metrics.callback(
+    "user_availability_filter_false_positive_rate", "Estimated false positive rate of the availability filter",
+    "gauge", lambda: user_availability.filter.estimated_error_rate if user_availability.filter is not None else 0,
+)
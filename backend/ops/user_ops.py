@@ -1,61 +1,236 @@
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 import uuid
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from core.bus import invalidation_bus
+from core.cache import invalidate_user
+from core.jobs import job_queue
+from core.profiling import traced
 from models import UserModel
+from ops import article_ops, timeline_ops
+from ops.article_search import search_backend
+from ops.user_availability import user_availability
+from models.users import RoleEnum
 
+@traced("db.get_user_by_id")
 async def get_user_by_id(db: AsyncSession, user_id: UUID):
     result = await db.execute(select(UserModel).where(UserModel.id == user_id))
     return result.scalars().first()
 
+@traced("db.get_user_by_email")
 async def get_user_by_email(db: AsyncSession, email: str):
     result = await db.execute(select(UserModel).where(UserModel.email == email))
     return result.scalars().first()
 
+@traced("db.get_user_by_username")
 async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(select(UserModel).where(UserModel.username == username))
     return result.scalars().first()
 
-async def create_user(db: AsyncSession, username: str, email: str, password: str, full_name: Optional[str] = None):
-    user = UserModel(
-        id=uuid.uuid4(),
+async def warm_up(db: AsyncSession):
+    # Compile and prepare the per-request lookups on this connection
+    await get_user_by_id(db, uuid.UUID(int=0))
+    await get_user_by_email(db, "")
+    await get_user_by_username(db, "")
+
+@traced("db.list_users")
+async def list_users(
+    db: AsyncSession,
+    limit: int,
+    after: Optional[tuple[datetime, UUID]] = None,
+    role: Optional[RoleEnum] = None,
+    is_verified: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    # Keyset pagination on (created_at, id), newest first. `after` is the
+    # sort key of the last row of the previous page.
+    stmt = select(UserModel)
+    if role is not None:
+        stmt = stmt.where(UserModel.role == role)
+    if is_verified is not None:
+        stmt = stmt.where(UserModel.is_verified == is_verified)
+    if created_from is not None:
+        stmt = stmt.where(UserModel.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(UserModel.created_at < created_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(UserModel.created_at, UserModel.id) < tuple_(*after))
+    stmt = stmt.order_by(UserModel.created_at.desc(), UserModel.id.desc()).limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def stream_users(db: AsyncSession, columns, batch_size: int):
+    # Server-side cursor, yields lists of at most `batch_size` rows
+    stmt = (
+        select(*columns)
+        .order_by(UserModel.created_at, UserModel.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions(batch_size):
+        yield rows
+
+class UserAlreadyExistsError(Exception):
+    """Raised when a write hits the users email or username unique constraint"""
+
+    def __init__(self, field: str, detail: str):
+        super().__init__(detail)
+        self.field = field
+        self.detail = detail
+
+def _duplicate_user_error(exc: IntegrityError) -> Exception:
+    # asyncpg reports the violated constraint by name ("users_email_key"),
+    # other drivers only put the column in the message
+    cause = getattr(exc.orig, "__cause__", None)
+    constraint = getattr(cause, "constraint_name", None) or str(exc.orig)
+    if "email" in constraint:
+        return UserAlreadyExistsError("email", "Email already registered")
+    if "username" in constraint:
+        return UserAlreadyExistsError("username", "Username already taken")
+    return exc
+
+async def _insert_user(db: AsyncSession, send_verification_email: bool = False, **values):
+    stmt = insert(UserModel).values(id=uuid.uuid4(), **values).returning(UserModel)
+    try:
+        result = await db.execute(stmt)
+        user = result.scalars().one()
+        await user_availability.names_taken(db, [("username", user.username), ("email", user.email)])
+        if send_verification_email:
+            # Same transaction, so there is never a user without their email job
+            await job_queue.enqueue(db, "send_verification_email", {"user_id": str(user.id)})
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise _duplicate_user_error(exc) from exc
+    return user
+
+@traced("db.create_user")
+async def create_user(
+    db: AsyncSession,
+    username: str,
+    email: str,
+    password: str,
+    full_name: Optional[str] = None,
+    send_verification_email: bool = False,
+):
+    return await _insert_user(
+        db,
+        send_verification_email,
         username=username,
         email=email,
         password=password,
         full_name=full_name
     )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
-    return user
 
+@traced("db.create_admin_user")
 async def create_admin_user(db: AsyncSession, username: str, email: str, password: str, role: str, full_name: Optional[str] = None):
-    user = UserModel(
+    return await _insert_user(
+        db,
         username=username,
         email=email,
         password=password,
         role=role,
         full_name=full_name
     )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
-    return user
 
+@traced("db.update_user")
 async def update_user(db: AsyncSession, user_id: UUID, **kwargs):
+    if not kwargs:
+        return await get_user_by_id(db, user_id)
     stmt = (
         update(UserModel)
         .where(UserModel.id == user_id)
         .values(**kwargs)
         .returning(UserModel)
     )
-    result = await db.execute(stmt)
-    await db.commit()
+    try:
+        result = await db.execute(stmt)
+        await invalidation_bus.publish(db, "users", str(user_id))
+        if "username" in kwargs or "full_name" in kwargs:
+            # Author names are part of their articles' search documents
+            await search_backend.author_changed(db, user_id)
+        await user_availability.names_taken(
+            db, [(field, kwargs[field]) for field in ("username", "email") if field in kwargs]
+        )
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise _duplicate_user_error(exc) from exc
+    invalidate_user(str(user_id))
     return result.scalars().first()
 
+@traced("db.delete_user")
 async def delete_user(db: AsyncSession, user_id: UUID):
+    # Their articles go by cascade, without passing through the tag counts
+    await article_ops.author_deleted(db, user_id)
+    # Same for their follows and the followees' follower counts
+    await timeline_ops.follower_deleted(db, user_id)
     stmt = delete(UserModel).where(UserModel.id == user_id).returning(UserModel)
     result = await db.execute(stmt)
+    await invalidation_bus.publish(db, "users", str(user_id))
+    await db.commit()
+    invalidate_user(str(user_id))
+    return result.scalars().first()
+
+@traced("db.bulk_insert_users")
+async def bulk_insert_users(db: AsyncSession, rows: list[dict]):
+    """Insert many users in one statement, skipping rows that hit a unique
+    constraint. Returns the ids that were inserted and a {id: reason}
+    mapping for the rows that were skipped."""
+    if not rows:
+        return set(), {}
+    for row in rows:
+        row.setdefault("id", uuid.uuid4())
+    stmt = (
+        pg_insert(UserModel)
+        .values(rows)
+        .on_conflict_do_nothing()
+        .returning(UserModel.id)
+    )
+    result = await db.execute(stmt)
+    inserted = set(result.scalars().all())
+    await user_availability.names_taken(
+        db,
+        [(field, row[field]) for row in rows if row["id"] in inserted for field in ("username", "email")],
+    )
+
+    skipped = [row for row in rows if row["id"] not in inserted]
+    conflicts = {}
+    if skipped:
+        result = await db.execute(
+            select(UserModel.email).where(
+                or_(
+                    UserModel.username.in_([row["username"] for row in skipped]),
+                    UserModel.email.in_([row["email"] for row in skipped]),
+                )
+            )
+        )
+        taken_emails = set(result.scalars().all())
+        for row in skipped:
+            if row["email"] in taken_emails:
+                conflicts[row["id"]] = "Email already registered"
+            else:
+                conflicts[row["id"]] = "Username already taken"
+    await db.commit()
+    return inserted, conflicts
+
+@traced("db.bulk_update_users")
+async def bulk_update_users(db: AsyncSession, user_ids: list[UUID], **kwargs):
+    stmt = (
+        update(UserModel)
+        .where(UserModel.id.in_(user_ids))
+        .values(**kwargs)
+        .returning(UserModel.id)
+    )
+    result = await db.execute(stmt)
+    updated = [str(user_id) for user_id in result.scalars().all()]
+    await invalidation_bus.publish_many(db, "users", updated)
     await db.commit()
-    return result.scalars().first()
\ No newline at end of file
+    for user_id in updated:
+        invalidate_user(user_id)
+    return updated